@@ -6,14 +6,11 @@ os.environ["STREAMLIT_GLOBAL_DEVELOPMENT_MODE"] = "false"
 
 import asyncio
 import sys
-import torch  
+import time
 from pathlib import Path
 
-# Torch patch
-import torch._classes
-if not hasattr(torch._classes, '__path__'):
-    torch._classes.__path__ = [os.path.dirname(torch._classes.__file__)]
-    
+# torch, transformers, cv2, fitz etc. are imported lazily by the utils
+# modules, so the login page renders without loading any of them
 project_root = Path(__file__).parent
 
 sys.path.insert(0, str(project_root))
@@ -24,27 +21,33 @@ if sys.platform == "win32":
     asyncio.set_event_loop_policy(asyncio.WindowsSelectorEventLoopPolicy())
 
 import streamlit as st
-import pandas as pd
-from utils.auth import AuthSystem
-from utils.database import init_db
-from utils.processors import ContentProcessor 
-from utils.questions import QuestionGenerator  
-
-# Initialize core components
-init_db()
-auth = AuthSystem()
-processor = ContentProcessor()
-qgen = QuestionGenerator()
+from utils.config import ADMIN_USERS
+from utils.database import get_content_pages, search_pages
+from utils.registry import (ensure_database, get_auth_system, get_content_processor,
+                            get_job_manager, get_review_scheduler, start_model_warmup)
+
+# Core components are created once per server and shared across sessions;
+# the processor and generator are fetched by the pages that need them, and
+# with EDUQUEST_PRELOAD_MODELS set the generator is also built at startup
+ensure_database()
+start_model_warmup()
+auth = get_auth_system()
+reviews = get_review_scheduler()
 
 # Session management
 if 'authenticated' not in st.session_state:
     st.session_state.update({
         'authenticated': False,
         'user_id': None,
+        'session_token': None,
         'processed_content': None,
         'questions': []
     })
 
+# Re-validate the signed session token on every rerun (no DB hit, no hashing)
+if st.session_state.authenticated and auth.verify_token(st.session_state.session_token) != st.session_state.user_id:
+    st.session_state.update({'authenticated': False, 'user_id': None, 'session_token': None})
+
 # Authentication flow
 if not st.session_state.authenticated:
     st.title("EduQuest AI -- Login")
@@ -57,6 +60,8 @@ st.sidebar.title("Navigation")
 
 def main():
     menu = ["📤 Upload", "❓ Questions", "📊 Progress"]
+    if st.session_state.user_id in ADMIN_USERS:
+        menu.append("🛠 Diagnostics")
     choice = st.sidebar.radio("Menu", menu)
 
     if choice == "📤 Upload":
@@ -65,6 +70,8 @@ def main():
         handle_questions()
     elif choice == "📊 Progress":
         show_progress()
+    elif choice == "🛠 Diagnostics":
+        show_diagnostics()
 
 def handle_upload():
     st.header("EduQuest AI PRO Question/Answer Generator")
@@ -72,19 +79,28 @@ def handle_upload():
     
     if file:
         try:
-            processed = processor.process_input(file.read(), file.type)
+            # Identical files (by hash) are served from the content table
+            bar = st.progress(0.0, text="Extracting pages...")
+            processed = get_content_processor().ingest(
+                file.getvalue(), file.type, st.session_state.user_id,
+                progress=lambda done, total: bar.progress(done / total, text=f"Extracted page {done} of {total}")
+            )
+            bar.empty()
             
             # Check processing status
             if processed['metadata']['status'] != 'processed':
                 st.error(f"Processing failed: {processed['metadata']['status']}")
                 return
             
+            previous = st.session_state.processed_content
+            if not previous or previous['metadata'].get('file_hash') != processed['metadata']['file_hash']:
+                st.session_state.questions = []  # Clear previous questions
+                st.session_state.generation_job = None
             st.session_state.processed_content = processed
             char_count = len(processed['text'])
             page_count = len(processed['pages'])
             
             st.success(f"Processed {page_count} page(s) with {char_count} characters!")
-            st.session_state.questions = []  # Clear previous questions
             
             # Optional: Show preview
             with st.expander("View extracted text"):
@@ -94,6 +110,31 @@ def handle_upload():
             st.error(f"Error processing file: {str(e)}")
             if 'processed' in locals():
                 st.json(processed)  # Debug output
+    
+    show_material_search()
+
+def show_material_search():
+    """Full-text search over the pages of everything this user has uploaded"""
+    st.subheader("Find material")
+    query = st.text_input("Search your uploads", key="material_search")
+    if not query.strip():
+        return
+    hits = search_pages(query, user_id=st.session_state.user_id, limit=10)
+    if not hits:
+        st.info("No matching pages")
+        return
+    documents = {}
+    for content_id, page, _ in hits:
+        # Only documents with hits are decompressed, once each
+        pages = documents.setdefault(content_id, get_content_pages(content_id))
+        text = pages[page] if page < len(pages) else ''
+        st.markdown(f"**Upload #{content_id}, page {page + 1}**")
+        st.text(text[:300] + ("..." if len(text) > 300 else ""))
+
+# UI labels -> generator question types / stored difficulty levels
+QUESTION_TYPES = {"MCQ": "MCQ", "Short Answer": "SHORT", "True/False": "TRUE_FALSE"}
+DIFFICULTY_LEVELS = {"Easy": 1, "Medium": 2, "Hard": 3}
+DIFFICULTY_LABELS = {level: label for label, level in DIFFICULTY_LEVELS.items()}
 
 def handle_questions():
     if not st.session_state.processed_content:
@@ -110,35 +151,96 @@ def handle_questions():
     col1, col2 = st.columns(2)
     
     with col1:
-        q_type = st.selectbox("Question Type", ["MCQ", "Short Answer", "True/False"])
+        q_type = st.selectbox("Question Type", list(QUESTION_TYPES))
         difficulty = st.select_slider("Difficulty", ["Easy", "Medium", "Hard"])
     
     with col2:
         num_q = st.slider("Number of Questions", 1, 20, 5)
         focus_area = st.text_input("Focus Area (optional)")
 
-    if st.button("Generate Questions"):
-        with st.spinner("Generating questions..."):
-            try:
-                questions = qgen.generate(
-                    text=content['text'],
-                    q_type=q_type,
-                    num_q=num_q,
-                    difficulty=difficulty,
-                    focus=focus_area
-                )
-                st.session_state.questions = questions
-                st.success(f"Generated {len(questions)} {q_type} questions!")
-                st.balloons()
-                
-            except Exception as e:
-                st.error(f"Generation failed: {str(e)}")
-                st.error("Please try with different content or parameters")
+    jobs = get_job_manager()
+    job = jobs.get(st.session_state.get('generation_job'), st.session_state.user_id)
+    if job is None and 'generation_job' not in st.session_state:
+        # New session (e.g. a page reload): re-attach to a job still running
+        active = jobs.active_for(st.session_state.user_id)
+        job = active[-1] if active else None
+    
+    if st.button("Generate Questions", disabled=bool(job and job.active)):
+        try:
+            pages = focus_pages(content, focus_area)
+            # Runs in the background; reruns re-attach through the job id
+            job = jobs.submit(
+                st.session_state.user_id,
+                '\n'.join(pages),
+                QUESTION_TYPES[q_type],
+                num_q,
+                pages=pages,
+                content_hash=content['metadata'].get('file_hash'),
+                difficulty=DIFFICULTY_LEVELS[difficulty],
+                content_id=content['metadata'].get('content_id')
+            )
+        except Exception as e:
+            st.error(f"Generation failed: {str(e)}")
+            return
+    
+    if job:
+        st.session_state.generation_job = job.id
+        show_generation_job(job)
+
+# Pages drawn from the full-text index when a focus area is given
+FOCUS_PAGES = 8
+
+def focus_pages(content, focus_area):
+    """Pages most relevant to the focus area, in document order; all pages without one"""
+    content_id = content['metadata'].get('content_id')
+    if not (focus_area.strip() and content_id):
+        return content['pages']
+    hits = search_pages(focus_area, content_id=content_id, limit=FOCUS_PAGES)
+    selected = sorted({page for _, page, _ in hits if page < len(content['pages'])})
+    if not selected:
+        st.info("No pages match the focus area; using the whole document")
+        return content['pages']
+    st.caption(f"Focusing on page(s) {', '.join(str(page + 1) for page in selected)}")
+    return [content['pages'][page] for page in selected]
+
+def show_generation_job(job):
+    """Render a job's questions so far; polls while it is still running"""
+    # Label from the job itself: the slider may have moved since it was submitted.
+    # Snapshot items are the job's own dicts, so label copies
+    label = DIFFICULTY_LABELS.get(job.difficulty, "Medium")
+    questions = [{**question, 'difficulty': label} for question in job.snapshot()]
+    
+    if job.active:
+        st.progress(job.progress(), text=f"Generated {len(questions)} of {job.count} questions...")
+        if st.button("Cancel generation"):
+            job.cancel()
+    for i, question in enumerate(questions, 1):
+        st.markdown(f"**{i}. {question['question']}**")
+        if question.get('options'):
+            st.write(" / ".join(question['options']))
+    
+    if job.active:
+        time.sleep(0.5)
+        st.rerun()
+    
+    if st.session_state.get('reported_job') == job.id:
+        return
+    st.session_state.reported_job = job.id
+    st.session_state.questions = questions
+    if job.status == 'done':
+        st.success(f"Generated {len(questions)} questions!")
+        st.balloons()
+    elif job.status == 'cancelled':
+        st.info(f"Generation cancelled; kept {len(questions)} questions")
+    else:
+        st.error(f"Generation failed: {job.error}")
+        st.error("Please try with different content or parameters")
 
 
 def show_progress():
     st.header("Learning Progress")
     if st.session_state.questions:
+        import pandas as pd
         df = pd.DataFrame([{
             "Type": q['type'],
             "Question": q['question'],
@@ -149,6 +251,56 @@ def show_progress():
         st.download_button("Export Progress", df.to_csv(), "progress.csv")
     else:
         st.info("No questions generated yet")
+    
+    show_review_queue()
+
+def show_review_queue():
+    st.subheader("Due for Review")
+    due = reviews.due_questions(st.session_state.user_id, limit=20)
+    if not due:
+        st.info("Nothing due right now")
+        return
+    
+    with st.form("review_session"):
+        answers = {}
+        for q in due:
+            st.markdown(f"**{q['question']}**")
+            with st.expander("Show answer"):
+                st.write(q['answer'])
+            answers[q['question_id']] = st.checkbox("I got this right", key=f"review_{q['question_id']}")
+        if st.form_submit_button("Finish review"):
+            reviews.record_session(st.session_state.user_id, answers.items())
+            st.success(f"Recorded {len(answers)} reviews")
+            st.rerun()
+
+def show_diagnostics():
+    """Per-stage pipeline metrics for this server process"""
+    import pandas as pd
+    from utils.metrics import metrics, prometheus_text
+    st.header("Pipeline Diagnostics")
+    snap = metrics.snapshot()
+    
+    def label(row):
+        return ', '.join(f"{k}={v}" for k, v in row['labels'].items())
+    
+    st.subheader("Stage timings")
+    if snap['summaries']:
+        st.dataframe(pd.DataFrame([{
+            "Metric": row['name'], "Labels": label(row), "Count": row['count'],
+            "Mean": row['mean'], "p50": row['p50'], "p95": row['p95'], "Max": row['max'], "Total": row['sum']
+        } for row in snap['summaries']]))
+    else:
+        st.info("Nothing recorded yet")
+    
+    st.subheader("Counters")
+    if snap['counters']:
+        st.dataframe(pd.DataFrame([{"Metric": row['name'], "Labels": label(row), "Value": row['value']}
+                                   for row in snap['counters']]))
+    
+    st.download_button("Download Prometheus text", prometheus_text(), "metrics.prom")
+    if st.button("Reset metrics"):
+        metrics.reset()
+        st.rerun()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -2,10 +2,29 @@
 import streamlit as st
 import sqlite3
 import hashlib
+import hmac
 import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from itsdangerous import URLSafeTimedSerializer
-from utils.config import SECRET_KEY  
+from itsdangerous import URLSafeTimedSerializer, BadSignature, SignatureExpired
+from utils.config import SECRET_KEY, SESSION_MAX_AGE, HASH_WORKERS
+from utils.database import connection, transaction
+
+# pbkdf2_hmac releases the GIL, so a small thread pool keeps a burst of
+# logins from stalling page renders; the semaphore bounds the backlog.
+_hash_pool = ThreadPoolExecutor(max_workers=HASH_WORKERS, thread_name_prefix="pwhash")
+_hash_slots = threading.BoundedSemaphore(HASH_WORKERS * 8)
+
+def hash_password(password, timeout=30):
+    """PBKDF2 hash computed on the bounded worker pool"""
+    if not _hash_slots.acquire(timeout=timeout):
+        raise RuntimeError("Too many sign-ins in progress, please try again")
+    try:
+        return _hash_pool.submit(hashlib.pbkdf2_hmac, 'sha256', password.encode(),
+                                 SECRET_KEY.encode(), 100000).result()
+    finally:
+        _hash_slots.release()
 
 
 class AuthSystem:
@@ -28,9 +47,8 @@ class AuthSystem:
             
 class AuthSystem:
     def __init__(self):
-        self.conn = sqlite3.connect('eduquest.db')
         self.serializer = URLSafeTimedSerializer(SECRET_KEY)
-        
+    
     def validate_password(self, password):
         """Enforce password policy"""
         if len(password) < 8:
@@ -53,6 +71,7 @@ class AuthSystem:
                 if user:
                     st.session_state.authenticated = True
                     st.session_state.user_id = user[0]
+                    st.session_state.session_token = self.issue_token(user[0])
                     st.rerun()
                 else:
                     st.error("Invalid credentials")
@@ -73,37 +92,39 @@ class AuthSystem:
         if not self.validate_password(password):
             raise ValueError("Password must be 8+ chars with uppercase and numbers")
             
-        hashed_pw = hashlib.pbkdf2_hmac('sha256', 
-                                      password.encode(), 
-                                      SECRET_KEY.encode(), 
-                                      100000)
+        hashed_pw = hash_password(password)
         try:
-            self.conn.execute('''INSERT INTO users 
-                              (username, password, email, created_at)
-                              VALUES (?, ?, ?, ?)''',
-                              (username, hashed_pw, email, datetime.now()))
-            self.conn.commit()
+            with transaction() as conn:
+                conn.execute('''INSERT INTO users 
+                             (username, password, email, created_at)
+                             VALUES (?, ?, ?, ?)''',
+                             (username, hashed_pw, email, datetime.now()))
         except sqlite3.IntegrityError:
             raise ValueError("Username/email already exists")
     
     def login_user(self, identifier, password):
         """Multi-factor authentication support"""
         # Check if identifier is email or username
-        if '@' in identifier:
-            user = self.conn.execute('''SELECT * FROM users 
-                                      WHERE email=?''', (identifier,)).fetchone()
-        else:
-            user = self.conn.execute('''SELECT * FROM users 
-                                      WHERE username=?''', (identifier,)).fetchone()
+        column = 'email' if '@' in identifier else 'username'
+        with connection() as conn:
+            user = conn.execute(f'''SELECT id, username, password FROM users 
+                                   WHERE {column}=?''', (identifier,)).fetchone()
         
         if user:
-            hashed_input = hashlib.pbkdf2_hmac('sha256', 
-                                              password.encode(),
-                                              SECRET_KEY.encode(), 
-                                              100000)
-            if hashed_input == user[2]:  # Compare hashed passwords
-                return user
+            hashed_input = hash_password(password)
+            if hmac.compare_digest(hashed_input, user[2]):  # Compare hashed passwords
+                return user[:2]
         return None
-
-    def __del__(self):
-        self.conn.close()
\ No newline at end of file
+    
+    def issue_token(self, user_id):
+        """Signed, timestamped session token for user_id"""
+        return self.serializer.dumps({'uid': user_id}, salt='session')
+    
+    def verify_token(self, token, max_age=SESSION_MAX_AGE):
+        """Return the user_id in a valid token, or None; no DB access or hashing"""
+        if not token:
+            return None
+        try:
+            return self.serializer.loads(token, salt='session', max_age=max_age)['uid']
+        except (BadSignature, SignatureExpired, KeyError, TypeError):
+            return None
\ No newline at end of file
@@ -0,0 +1,130 @@
+# benchmarks/backends.py
+"""Accuracy/latency comparison of CPU inference backends.
+
+    python benchmarks/backends.py --types MCQ LONG --backends fp32 int8 onnx --threads 4
+
+Every backend sees the same fixed chunks for a question type. Latency is the
+time per batched pipeline call; accuracy is agreement with the fp32 outputs
+(exact match for extractive/label outputs, token F1 for generated text).
+"""
+import argparse
+import gc
+import json
+import statistics
+import sys
+import time
+from pathlib import Path
+
+project_root = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(project_root))
+
+from utils.chunking import chunk_pages
+from utils.questions import QuestionGenerator, CHUNK_TOKENS, BACKENDS
+
+SAMPLE_TEXT = """
+Photosynthesis is the process by which green plants convert light energy into chemical energy.
+It takes place mainly in the chloroplasts of leaf cells, which contain the pigment chlorophyll.
+During the light-dependent reactions, water is split and oxygen is released as a by-product.
+The energy captured is stored in ATP and NADPH, which power the Calvin cycle in the stroma.
+In the Calvin cycle, carbon dioxide from the air is fixed into three-carbon sugars.
+These sugars are used to build glucose, starch and cellulose for growth and energy storage.
+The rate of photosynthesis depends on light intensity, carbon dioxide concentration and temperature.
+When any one of these factors is in short supply, it limits the overall rate of the process.
+Plants in hot, dry climates have evolved C4 and CAM pathways that reduce water loss.
+These adaptations let them keep their stomata closed during the hottest part of the day.
+Photosynthesis supplies nearly all the oxygen in the atmosphere and the energy for food chains.
+Without it, life as we know it on Earth could not be sustained for more than a few years.
+"""
+
+# Which output field is compared against fp32, and how
+COMPARE = {'MCQ': ('question', 'f1'), 'SHORT': ('answer', 'exact'),
+           'TRUE_FALSE': ('answer', 'exact'), 'LONG': ('answer', 'f1')}
+
+
+def token_f1(a: str, b: str) -> float:
+    a_tokens, b_tokens = a.lower().split(), b.lower().split()
+    common = sum(min(a_tokens.count(t), b_tokens.count(t)) for t in set(a_tokens))
+    if not common:
+        return 0.0
+    precision, recall = common / len(a_tokens), common / len(b_tokens)
+    return 2 * precision * recall / (precision + recall)
+
+
+def agreement(q_type, outputs, reference):
+    field, mode = COMPARE[q_type]
+    scores = []
+    for out, ref in zip(outputs, reference):
+        if mode == 'exact':
+            scores.append(float(out[field].strip() == ref[field].strip()))
+        else:
+            scores.append(token_f1(out[field], ref[field]))
+    return sum(scores) / len(scores)
+
+
+def run_backend(q_type, backend, chunks, threads, batch_size, repeats):
+    qgen = QuestionGenerator(batch_size=batch_size, use_cache=False, preload=[],
+                             backends={q_type: backend}, num_threads=threads)
+    start = time.perf_counter()
+    qgen.models[q_type]
+    load_s = time.perf_counter() - start
+
+    qgen._generate_batch(chunks[:1], q_type)  # Warm-up
+    latencies = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        outputs = qgen._generate_batch(chunks, q_type)
+        latencies.append(time.perf_counter() - start)
+
+    size_mb = qgen.models[q_type]['size_mb']
+    del qgen
+    gc.collect()
+    return outputs, {
+        'load_s': round(load_s, 2),
+        'size_mb': round(size_mb, 1),
+        'batch_p50_ms': round(statistics.median(latencies) * 1000, 1),
+        'questions_per_s': round(len(chunks) / statistics.median(latencies), 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare fp32 / int8 / onnx inference backends")
+    parser.add_argument('--types', nargs='+', default=['MCQ', 'SHORT', 'TRUE_FALSE', 'LONG'])
+    parser.add_argument('--backends', nargs='+', default=list(BACKENDS), choices=BACKENDS)
+    parser.add_argument('--text', help="Plain-text file to build chunks from (default: built-in sample)")
+    parser.add_argument('--chunks', type=int, default=8, help="Chunks per batch")
+    parser.add_argument('--threads', type=int, default=1)
+    parser.add_argument('--batch-size', type=int, default=8)
+    parser.add_argument('--repeats', type=int, default=3)
+    parser.add_argument('--output', help="Write results as JSON")
+    args = parser.parse_args()
+
+    text = Path(args.text).read_text() if args.text else SAMPLE_TEXT
+    results = []
+    for q_type in args.types:
+        # Short windows so even the built-in sample yields several distinct chunks
+        chunks = chunk_pages([text], max_tokens=min(CHUNK_TOKENS[q_type], 96), overlap=0)
+        chunks = (chunks * args.chunks)[:args.chunks]
+        backends = ['fp32'] + [b for b in args.backends if b != 'fp32']
+        reference, baseline = None, None
+        for backend in backends:
+            try:
+                outputs, stats = run_backend(q_type, backend, chunks, args.threads, args.batch_size, args.repeats)
+            except Exception as e:
+                print(f"{q_type:<10} {backend:<5} failed: {e}")
+                continue
+            if backend == 'fp32':
+                reference, baseline = outputs, stats['questions_per_s']
+            stats.update(q_type=q_type, backend=backend,
+                         speedup=round(stats['questions_per_s'] / baseline, 2) if baseline else None,
+                         agreement=round(agreement(q_type, outputs, reference), 3) if reference else None)
+            results.append(stats)
+            print(f"{q_type:<10} {backend:<5} {stats['batch_p50_ms']:>9.1f} ms/batch "
+                  f"{stats['questions_per_s']:>7.2f} q/s  x{stats['speedup']}  agreement={stats['agreement']}")
+
+    if args.output:
+        Path(args.output).parent.mkdir(parents=True, exist_ok=True)
+        Path(args.output).write_text(json.dumps({'threads': args.threads, 'results': results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,208 @@
+# benchmarks/hotpaths.py
+"""Benchmarks for the extraction and generation hot paths.
+
+Uses synthetic PDFs and images plus the stub pipelines in stubs.py, so it
+runs offline on any Linux box with the project's Python dependencies:
+
+    python benchmarks/hotpaths.py --output benchmarks/results/hotpaths.json
+
+Reports pages/sec, OCR images/sec, enhanced images/sec and questions/sec with
+p50/p95 latency per call, plus peak RSS, as machine-readable JSON for
+comparing runs. Suites whose dependencies are missing (e.g. no Tesseract
+binary) are reported as skipped rather than failing the run.
+"""
+import argparse
+import json
+import platform
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+project_root = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(project_root))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from stubs import stub_loaders
+
+LOREM = ("Cells are the basic structural and functional units of living organisms. "
+         "The nucleus stores genetic information and controls the activities of the cell. "
+         "Mitochondria release energy from glucose through cellular respiration. "
+         "Ribosomes assemble proteins from amino acids using instructions carried by messenger RNA. ")
+
+
+def synthetic_image(width=640, height=360, text="Sample handout text 123", seed=0):
+    """PNG bytes of dark text on a light, slightly noisy background"""
+    import cv2
+    import numpy as np
+    rng = np.random.default_rng(seed)
+    img = np.full((height, width), 235, np.uint8)
+    for row, y in enumerate(range(40, height - 20, 40)):
+        cv2.putText(img, f"{text} {row}", (20, y), cv2.FONT_HERSHEY_SIMPLEX, 0.9, 20, 2)
+    noise = rng.normal(0, 6, img.shape)
+    img = np.clip(img + noise, 0, 255).astype(np.uint8)
+    return cv2.imencode('.png', img)[1].tobytes()
+
+
+def synthetic_pdf(pages=40, images_per_page=1, scanned_every=0):
+    """PDF bytes with text pages, embedded images and optional image-only (scanned) pages"""
+    import fitz
+    doc = fitz.open()
+    image = synthetic_image()
+    for page_no in range(pages):
+        page = doc.new_page()
+        scanned = scanned_every and page_no % scanned_every == scanned_every - 1
+        if not scanned:
+            page.insert_textbox(fitz.Rect(50, 50, 550, 500), f"Page {page_no + 1}. " + LOREM * 4, fontsize=10)
+        for i in range(images_per_page if not scanned else 1):
+            rect = fitz.Rect(50, 520 + i * 10, 550, 780) if not scanned else page.rect
+            page.insert_image(rect, stream=image)
+    data = doc.tobytes()
+    doc.close()
+    return data
+
+
+def measure(fn, repeats):
+    """Run fn `repeats` times; return per-call latencies in seconds"""
+    latencies = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+def summarize(latencies, units_per_call, unit):
+    ordered = sorted(latencies)
+    p95 = ordered[min(len(ordered) - 1, int(round(0.95 * (len(ordered) - 1))))]
+    return {
+        'calls': len(latencies),
+        f'{unit}_per_s': round(units_per_call * len(latencies) / sum(latencies), 2),
+        'p50_ms': round(statistics.median(latencies) * 1000, 2),
+        'p95_ms': round(p95 * 1000, 2),
+    }
+
+
+def bench_process_pdf(args):
+    from utils.processors import ContentProcessor
+    pdf = synthetic_pdf(args.pages)
+    results = {}
+    for mode, workers in (('serial', 1), ('parallel', args.workers)):
+        processor = ContentProcessor(workers=workers, parallel_min_pages=1, ocr_dpi=0)
+        results[mode] = summarize(measure(lambda: processor.process_pdf(pdf), args.repeats), args.pages, 'pages')
+    return results
+
+
+def bench_scanned_pdf(args):
+    from utils.processors import ContentProcessor
+    pages = max(4, args.pages // 4)
+    pdf = synthetic_pdf(pages, images_per_page=0, scanned_every=1)
+    processor = ContentProcessor(workers=1, ocr_workers=args.workers)
+    return summarize(measure(lambda: processor.process_pdf(pdf), args.repeats), pages, 'pages')
+
+
+def bench_process_image(args):
+    from utils.processors import ContentProcessor
+    processor = ContentProcessor()
+    images = [synthetic_image(seed=i) for i in range(args.repeats)]
+    it = iter(images)
+    return summarize(measure(lambda: processor.process_image(next(it)), len(images)), 1, 'images')
+
+
+def bench_enhance_image(args):
+    from utils.processors import ContentProcessor
+    image = synthetic_image(1280, 720)
+    return summarize(measure(lambda: ContentProcessor.enhance_image(image), args.repeats * 5), 1, 'images')
+
+
+def bench_generate(args):
+    from utils import database
+    from utils.questions import QuestionGenerator
+    text = '\n'.join(f"Page {i + 1}. " + LOREM * 3 for i in range(args.pages))
+    pages = text.split('\n')
+    results = {}
+    # Sentence index lookups hit the database; keep them off the app's eduquest.db
+    app_db = database.DB_PATH
+    with tempfile.TemporaryDirectory() as tmp:
+        database.DB_PATH = str(Path(tmp) / 'bench.db')
+        database.init_db()
+        try:
+            for q_type in ('MCQ', 'SHORT', 'TRUE_FALSE', 'LONG'):
+                qgen = QuestionGenerator(use_cache=False, preload=[q_type], loaders=stub_loaders(args.stub_delay))
+                produced = []
+                latencies = measure(lambda: produced.append(len(qgen.generate_questions(text, q_type, args.questions,
+                                                                                        pages=pages))),
+                                    args.repeats)
+                results[q_type] = summarize(latencies, sum(produced) / len(produced), 'questions')
+                results[q_type]['questions_per_call'] = sum(produced) / len(produced)
+                results[q_type]['pipeline_calls'] = qgen.models[q_type]['model'].calls
+        finally:
+            database.DB_PATH = app_db
+    return results
+
+
+SUITES = {
+    'process_pdf': bench_process_pdf,
+    'process_pdf_scanned': bench_scanned_pdf,
+    'process_image': bench_process_image,
+    'enhance_image': bench_enhance_image,
+    'generate_questions': bench_generate,
+}
+
+
+def peak_rss_mb():
+    # ru_maxrss is in KB on Linux; children covers the process pools
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    return {'self': round(own / 1024, 1), 'children': round(children / 1024, 1)}
+
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=project_root,
+                              capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark extraction and generation hot paths")
+    parser.add_argument('--suites', nargs='+', default=list(SUITES), choices=SUITES)
+    parser.add_argument('--pages', type=int, default=40, help="Pages in the synthetic PDF/document")
+    parser.add_argument('--questions', type=int, default=20, help="Questions per generate call")
+    parser.add_argument('--repeats', type=int, default=5)
+    parser.add_argument('--workers', type=int, default=4, help="Processes for the parallel modes")
+    parser.add_argument('--stub-delay', type=float, default=0.0, help="Seconds per stub inference item")
+    parser.add_argument('--output', help="Write results as JSON")
+    args = parser.parse_args()
+
+    report = {
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'revision': git_revision(),
+        'platform': platform.platform(),
+        'python': platform.python_version(),
+        'params': vars(args),
+        'results': {},
+    }
+    for name in args.suites:
+        try:
+            report['results'][name] = SUITES[name](args)
+        except ImportError as e:
+            report['results'][name] = {'skipped': f"missing dependency: {e.name}"}
+        except Exception as e:
+            report['results'][name] = {'skipped': f"{type(e).__name__}: {e}"}
+        print(f"{name}: {json.dumps(report['results'][name])}")
+    report['peak_rss_mb'] = peak_rss_mb()
+    print(f"peak RSS: {report['peak_rss_mb']}")
+
+    if args.output:
+        Path(args.output).parent.mkdir(parents=True, exist_ok=True)
+        Path(args.output).write_text(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
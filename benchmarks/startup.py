@@ -0,0 +1,88 @@
+# benchmarks/startup.py
+"""Cold-start import benchmark for the login path.
+
+Runs the imports app.py performs before the login page renders in a fresh
+interpreter under `-X importtime`, then summarizes the report:
+
+    python benchmarks/startup.py --output benchmarks/results/startup.json
+
+Exits non-zero if the budget is exceeded or a heavy dependency was loaded.
+"""
+import argparse
+import json
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+project_root = Path(__file__).resolve().parent.parent
+
+# What app.py imports and constructs before auth.render_login()
+LOGIN_PATH = """
+import streamlit
+from utils.database import insert_questions
+from utils.registry import ensure_database, get_auth_system, get_review_scheduler
+import utils.auth, utils.review
+"""
+
+HEAVY_MODULES = ['torch', 'transformers', 'cv2', 'skimage', 'fitz', 'pytesseract', 'magic', 'pandas']
+
+
+def parse_importtime(stderr):
+    """Return {module: (self_us, cumulative_us, depth)} from -X importtime output"""
+    modules = {}
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        # Nested imports are indented two spaces per level
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        modules[name.strip()] = (int(self_us), int(cumulative_us), depth)
+    return modules
+
+
+def run(code=LOGIN_PATH):
+    start = time.perf_counter()
+    proc = subprocess.run([sys.executable, '-X', 'importtime', '-c', code],
+                          cwd=project_root, capture_output=True, text=True)
+    wall_ms = (time.perf_counter() - start) * 1000
+    if proc.returncode != 0:
+        raise RuntimeError(proc.stderr.strip().splitlines()[-1])
+
+    modules = parse_importtime(proc.stderr)
+    top_level = {name: cum for name, (_, cum, depth) in modules.items() if depth == 0}
+    slowest = sorted(top_level.items(), key=lambda item: item[1], reverse=True)[:15]
+    return {
+        'wall_ms': round(wall_ms, 1),
+        'import_ms': round(sum(top_level.values()) / 1000, 1),
+        'module_count': len(modules),
+        'heavy_loaded': [name for name in HEAVY_MODULES if name in modules],
+        'slowest': [{'module': name, 'cumulative_ms': round(us / 1000, 1)} for name, us in slowest],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--output', help="Write the report as JSON")
+    parser.add_argument('--budget-ms', type=float, default=1000, help="Fail above this import time")
+    args = parser.parse_args()
+
+    report = run()
+    report['budget_ms'] = args.budget_ms
+    print(f"Login path imports: {report['import_ms']} ms ({report['module_count']} modules, "
+          f"{report['wall_ms']} ms wall incl. interpreter start)")
+    for entry in report['slowest']:
+        print(f"  {entry['cumulative_ms']:>9.1f} ms  {entry['module']}")
+    if report['heavy_loaded']:
+        print(f"Heavy modules loaded before login: {', '.join(report['heavy_loaded'])}")
+
+    if args.output:
+        Path(args.output).parent.mkdir(parents=True, exist_ok=True)
+        Path(args.output).write_text(json.dumps(report, indent=2))
+
+    if report['heavy_loaded'] or report['import_ms'] > args.budget_ms:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
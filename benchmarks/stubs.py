@@ -0,0 +1,56 @@
+# benchmarks/stubs.py
+"""Deterministic stand-ins for the Hugging Face pipelines.
+
+They return the same output shapes as the real pipelines (including for
+batched list inputs) without downloading or running a model, so the code
+around inference can be measured offline. `delay` adds a fixed per-item
+cost to mimic model latency.
+"""
+import time
+import zlib
+
+
+def _words(text):
+    return [w.strip('.,;:!?()') for w in text.split() if len(w) > 3]
+
+
+def _pick(text, salt=0):
+    """Deterministic but input-dependent word choice"""
+    words = _words(text) or ['topic']
+    return words[(zlib.crc32(text.encode()) + salt) % len(words)]
+
+
+class StubPipeline:
+    tokenizer = None  # Chunking falls back to estimated token counts
+
+    def __init__(self, q_type, delay=0.0):
+        self.q_type = q_type
+        self.delay = delay
+        self.calls = 0
+
+    def __call__(self, inputs, **kwargs):
+        self.calls += 1
+        single = not isinstance(inputs, list)
+        items = [inputs] if single else inputs
+        if self.delay:
+            time.sleep(self.delay * len(items))
+        outputs = [self._one(item) for item in items]
+        return outputs[0] if single else outputs
+
+    def _one(self, item):
+        if self.q_type == 'MCQ':
+            return [{'generated_text': f"What does the passage explain about {_pick(item)}?"}]
+        if self.q_type == 'SHORT':
+            return {'answer': f"How is {_pick(item['context'])} described in the text?", 'score': 0.5}
+        if self.q_type == 'TRUE_FALSE':
+            labels = ["entailment", "contradiction"]
+            if zlib.crc32(item.encode()) % 2:
+                labels.reverse()
+            return {'sequence': item[:160], 'labels': labels, 'scores': [0.6, 0.4]}
+        return [{'summary_text': ' '.join(_words(item)[:60])}]
+
+
+def stub_loaders(delay=0.0):
+    """Loaders for QuestionGenerator(loaders=...) backed by StubPipeline"""
+    return {q_type: (lambda q_type=q_type: {'model': StubPipeline(q_type, delay), 'type': 'stub'})
+            for q_type in ('MCQ', 'SHORT', 'TRUE_FALSE', 'LONG')}
@@ -0,0 +1,276 @@
+# File: utils/bulk.py
+"""Headless question-bank builder for directories of course material.
+
+    python -m utils.bulk lectures/ --types MCQ SHORT --count 10
+    python -m utils.bulk manifest.jsonl --workers 8
+
+Sources are directories (searched recursively for PDFs, images and text
+files), single documents, or manifests: `*.manifest` / `*.manifest.txt`
+files with one path per line, or `*.jsonl` files of {"path", optional
+"types", "count", "difficulty"} objects. Any other .txt is a document.
+
+Files are extracted in a process pool while earlier documents are being
+generated, and every group of documents is written in one transaction.
+Content rows are stored as soon as a group is extracted and questions once
+they are generated, so an interrupted run resumes where it stopped: files
+whose hash already has `count` questions of each requested type are
+skipped, types that came out short are topped up with only the missing
+number, and stored content is not extracted again.
+"""
+import argparse
+import hashlib
+import json
+import logging
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional
+
+from utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+FILE_TYPES = {
+    '.pdf': 'application/pdf',
+    '.txt': 'text/plain',
+    '.png': 'image/png',
+    '.jpg': 'image/jpeg',
+    '.jpeg': 'image/jpeg',
+}
+
+
+def _job(path, types, count, difficulty) -> Optional[Dict]:
+    file_type = FILE_TYPES.get(Path(path).suffix.lower())
+    if file_type is None:
+        logger.warning(f"Skipping {path}: unsupported file type")
+        return None
+    return {'path': str(path), 'file_type': file_type, 'types': list(types),
+            'count': count, 'difficulty': difficulty}
+
+
+def is_manifest(path: Path) -> bool:
+    """Manifests are named *.jsonl, *.manifest or *.manifest.txt; other .txt files are documents"""
+    name = path.name.lower()
+    return name.endswith(('.jsonl', '.manifest', '.manifest.txt'))
+
+
+def collect_jobs(sources: List[str], types: List[str], count: int,
+                 difficulty: Optional[int] = None) -> List[Dict]:
+    """Expand directories and manifests into one job per supported file"""
+    jobs = []
+    for source in map(Path, sources):
+        if source.is_dir():
+            candidates = sorted(p for p in source.rglob('*') if p.suffix.lower() in FILE_TYPES and not is_manifest(p))
+            jobs.extend(_job(p, types, count, difficulty) for p in candidates)
+        elif source.name.lower().endswith('.jsonl'):
+            with open(source) as f:
+                for line in filter(str.strip, f):
+                    entry = json.loads(line)
+                    path = source.parent / entry['path']
+                    jobs.append(_job(path, entry.get('types', types), entry.get('count', count),
+                                     entry.get('difficulty', difficulty)))
+        elif not is_manifest(source):
+            jobs.append(_job(source, types, count, difficulty))
+        else:
+            with open(source) as f:
+                jobs.extend(_job(source.parent / line.strip(), types, count, difficulty)
+                            for line in f if line.strip() and not line.startswith('#'))
+    return [job for job in jobs if job]
+
+
+def file_hash(path: str) -> str:
+    """Same digest ContentProcessor.ingest uses, streamed so large files aren't held in memory"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+# ContentProcessor for the current pool worker, created by the initializer
+_worker_processor = None
+
+def _init_extract_worker():
+    global _worker_processor
+    from utils.processors import ContentProcessor
+    # The pool already runs one file per CPU; keep each file's work in-process
+    _worker_processor = ContentProcessor(workers=1, ocr_workers=1)
+
+def _extract_file(path, file_type):
+    """Pool task: extract one file; images are dropped so nothing heavy crosses the pipe"""
+    result = _worker_processor.process_input(Path(path).read_bytes(), file_type)
+    return {'text': result['text'], 'pages': result['pages'], 'status': result['metadata']['status']}
+
+
+class BankBuilder:
+    """Extract, generate and store question banks for a list of jobs"""
+
+    def __init__(self, generator, workers: Optional[int] = None, group_size: int = 8,
+                 user_id: Optional[int] = None):
+        self.generator = generator  # QuestionGenerator or InferenceClient
+        self.workers = workers or os.cpu_count() or 1  # Extraction processes
+        self.group_size = group_size  # Documents generated and written together
+        self.user_id = user_id  # Owner recorded on content and questions
+        self.stats = {'skipped': 0, 'extracted': 0, 'failed': 0, 'resumed': 0, 'questions': 0}
+
+    def plan(self, jobs: List[Dict]) -> List[Dict]:
+        """Hash every file and drop the work a previous run already finished"""
+        from utils.database import add_content_owners, get_content_ids, question_counts
+        for job in jobs:
+            job['file_hash'] = file_hash(job['path'])
+        stored = get_content_ids({job['file_hash'] for job in jobs})
+        add_content_owners((self.user_id, content_id) for content_id in stored.values())
+        counts = question_counts(set(stored.values()))
+
+        planned, seen = [], set()
+        for job in jobs:
+            if job['file_hash'] in seen:
+                self.stats['skipped'] += 1  # Same file listed twice
+                continue
+            seen.add(job['file_hash'])
+            job['content_id'] = stored.get(job['file_hash'])
+            # Top up types that came out short (generation shortfall, duplicates)
+            done = counts.get(job['content_id'], {})
+            job['needed'] = {t: job['count'] - done.get(t, 0) for t in job['types']
+                             if done.get(t, 0) < job['count']}
+            job['types'] = list(job['needed'])
+            if not job['types']:
+                self.stats['skipped'] += 1
+                continue
+            planned.append(job)
+        return planned
+
+    def run(self, jobs: List[Dict]) -> Dict:
+        start = time.perf_counter()
+        jobs = self.plan(jobs)
+        logger.info(f"{len(jobs)} document(s) to process, {self.stats['skipped']} already done")
+
+        pool = ProcessPoolExecutor(max_workers=self.workers, initializer=_init_extract_worker)
+        try:
+            group = []
+            for job in self._documents(pool, jobs):
+                group.append(job)
+                if len(group) >= self.group_size:
+                    self._process_group(group)
+                    group = []
+            if group:
+                self._process_group(group)
+        finally:
+            pool.shutdown(cancel_futures=True)
+
+        self.stats['seconds'] = round(time.perf_counter() - start, 1)
+        return self.stats
+
+    def _documents(self, pool, jobs: List[Dict]) -> Iterator[Dict]:
+        """Yield jobs with 'text' and 'pages' filled in, in order.
+
+        Stored content is read back from the database; new files are
+        extracted in the pool, which works up to two groups ahead of
+        generation.
+        """
+        from utils.database import get_content_by_hash
+        from utils.processors import PAGE_BREAK
+        pending = deque()
+        remaining = iter(jobs)
+        window = max(self.workers, self.group_size) * 2
+
+        def submit():
+            job = next(remaining, None)
+            if job is None:
+                return
+            future = None
+            if job['content_id'] is None:
+                future = pool.submit(_extract_file, job['path'], job['file_type'])
+            pending.append((job, future))
+
+        for _ in range(window):
+            submit()
+        while pending:
+            job, future = pending.popleft()
+            submit()
+            if future is None:
+                _, raw_text, processed_text = get_content_by_hash(job['file_hash'])
+                job.update(text=processed_text, pages=raw_text.split(PAGE_BREAK))
+                self.stats['resumed'] += 1
+                yield job
+                continue
+            try:
+                result = future.result()
+            except Exception as e:
+                result = {'status': f"error: {e}"}
+            if result['status'] != 'processed' or not result['text'].strip():
+                logger.warning(f"Skipping {job['path']}: {result['status']}")
+                self.stats['failed'] += 1
+                metrics.incr('bulk_documents', result='failed')
+                continue
+            job.update(text=result['text'], pages=result['pages'])
+            self.stats['extracted'] += 1
+            yield job
+
+    def _process_group(self, group: List[Dict]):
+        from utils.database import insert_question_sets, save_contents, save_sentence_indexes
+        from utils.sentence_index import SentenceIndex
+        from utils.processors import PAGE_BREAK
+        # Keep extracted text even if generation fails, so a rerun only generates
+        new = [job for job in group if job['content_id'] is None]
+        ids = save_contents([(self.user_id, PAGE_BREAK.join(job['pages']), job['text'], job['file_hash'])
+                             for job in new])
+        for job in new:
+            job['content_id'] = ids[job['file_hash']]
+        save_sentence_indexes([(job['content_id'], SentenceIndex.build(job['text']).to_bytes()) for job in new])
+
+        sets = []
+        for q_type in sorted({t for job in group for t in job['types']}):
+            batch = [job for job in group if q_type in job['types']]
+            requests = [{'context': job['text'], 'count': job['needed'][q_type], 'pages': job['pages'],
+                         'content_hash': job['file_hash']} for job in batch]
+            try:
+                results = self.generator.generate_many(requests, q_type)
+            except Exception as e:
+                logger.warning(f"{q_type} generation failed for {len(batch)} document(s): {e}")
+                results = [[] for _ in batch]
+            for job, questions in zip(batch, results):
+                if not questions:
+                    logger.warning(f"No valid {q_type} questions for {job['path']}; will retry next run")
+                    continue
+                sets.append((job['content_id'], questions, job['difficulty'], self.user_id))
+
+        insert_question_sets(sets)
+        written = sum(len(questions) for _, questions, _, _ in sets)
+        self.stats['questions'] += written
+        metrics.incr('bulk_documents', len(group), result='processed')
+        metrics.incr('bulk_questions', written)
+        logger.info(f"Stored {written} questions for {len(group)} document(s) "
+                    f"({self.stats['extracted'] + self.stats['resumed']} done)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build question banks from directories of documents")
+    parser.add_argument('sources', nargs='+', help="Directories, files, or manifests (*.manifest[.txt] / *.jsonl)")
+    parser.add_argument('--types', nargs='+', default=['MCQ'], choices=['MCQ', 'SHORT', 'TRUE_FALSE', 'LONG'])
+    parser.add_argument('--count', type=int, default=10, help="Questions per type per document")
+    parser.add_argument('--difficulty', type=int, choices=[1, 2, 3])
+    parser.add_argument('--user-id', type=int, help="Owner recorded on content and questions")
+    parser.add_argument('--workers', type=int, help="Extraction processes (default: one per CPU)")
+    parser.add_argument('--group-size', type=int, default=8, help="Documents per generation batch and write")
+    parser.add_argument('--db', help="Database path (default: the app's)")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    from utils import database
+    if args.db:
+        database.DB_PATH = args.db
+    database.init_db()
+
+    from utils.registry import get_question_generator
+    jobs = collect_jobs(args.sources, args.types, args.count, args.difficulty)
+    builder = BankBuilder(get_question_generator(), workers=args.workers,
+                          group_size=args.group_size, user_id=args.user_id)
+    stats = builder.run(jobs)
+    print(json.dumps(stats))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+# File: utils/cache.py
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from typing import Dict, List
+import logging
+
+from utils.database import (get_cached_generations, save_cached_generations,
+                            purge_stale_generations)
+
+logger = logging.getLogger(__name__)
+
+
+def content_hash(text: str) -> str:
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+def make_key(doc_hash: str, chunk: str, q_type: str, model_id: str,
+             params: Dict, variant: int = 0) -> str:
+    """Cache key for one pipeline output"""
+    parts = [doc_hash, content_hash(chunk), q_type, model_id,
+             json.dumps(params, sort_keys=True), variant]
+    return hashlib.sha256(json.dumps(parts).encode('utf-8')).hexdigest()
+
+
+class GenerationCache:
+    """Two-tier cache of generated candidates: in-memory LRU over SQLite"""
+
+    def __init__(self, max_entries: int = 4096, persist: bool = True):
+        self.max_entries = max_entries
+        self.persist = persist
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._checked_models = set()
+        self.hits = 0
+        self.misses = 0
+
+    def invalidate_stale(self, q_type: str, model_id: str):
+        """Forget rows written by a different model version (once per process)"""
+        if (q_type, model_id) in self._checked_models:
+            return
+        self._checked_models.add((q_type, model_id))
+        with self._lock:
+            for key in [k for k, (t, m, _) in self._memory.items() if t == q_type and m != model_id]:
+                del self._memory[key]
+        if self.persist:
+            try:
+                purge_stale_generations(q_type, model_id)
+            except Exception as e:
+                logger.warning(f"Could not purge stale cache rows: {e}")
+
+    def get_many(self, keys: List[str], q_type: str, model_id: str) -> Dict[str, Dict]:
+        found = {}
+        with self._lock:
+            for key in keys:
+                if key in self._memory:
+                    self._memory.move_to_end(key)
+                    found[key] = self._memory[key][2]
+        missing = [key for key in keys if key not in found]
+        if missing and self.persist:
+            try:
+                stored = get_cached_generations(missing)
+            except Exception as e:
+                logger.warning(f"Generation cache lookup failed: {e}")
+                stored = {}
+            # Promote rows loaded from SQLite into the memory tier
+            self._store_memory([(key, q_type, model_id, result) for key, result in stored.items()])
+            found.update(stored)
+        self.hits += len(found)
+        self.misses += len(keys) - len(found)
+        return found
+
+    def put_many(self, entries: List[tuple]):
+        """entries: (key, doc_hash, q_type, model_id, result)"""
+        self._store_memory([(key, q_type, model_id, result) for key, _, q_type, model_id, result in entries])
+        if self.persist:
+            try:
+                save_cached_generations(entries)
+            except Exception as e:
+                logger.warning(f"Could not persist generated questions: {e}")
+
+    def _store_memory(self, entries: List[tuple]):
+        with self._lock:
+            for key, q_type, model_id, result in entries:
+                self._memory[key] = (q_type, model_id, result)
+                self._memory.move_to_end(key)
+            while len(self._memory) > self.max_entries:
+                self._memory.popitem(last=False)
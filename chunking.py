@@ -0,0 +1,89 @@
+# File: utils/chunking.py
+import re
+from typing import Callable, List
+
+SENTENCE_END = re.compile(r'(?<=[.!?])\s+')
+
+
+def token_counter(tokenizer=None) -> Callable[[str], int]:
+    """Count tokens with the model's tokenizer, or estimate from words"""
+    if tokenizer is not None:
+        return lambda text: len(tokenizer.encode(text, add_special_tokens=False))
+    return lambda text: int(len(text.split()) * 1.3) + 1
+
+
+def _split_long(sentence: str, max_tokens: int, count: Callable[[str], int]) -> List[str]:
+    """Hard-split a sentence that does not fit in one window"""
+    words = sentence.split()
+    pieces, current = [], []
+    for word in words:
+        current.append(word)
+        if count(' '.join(current)) > max_tokens and len(current) > 1:
+            current.pop()
+            pieces.append(' '.join(current))
+            current = [word]
+    if current:
+        pieces.append(' '.join(current))
+    return pieces
+
+
+def chunk_pages(pages: List[str], tokenizer=None, max_tokens: int = 384,
+                overlap: int = 32) -> List[str]:
+    """Split page texts into windows of at most max_tokens tokens.
+
+    Windows are built from whole sentences and prefer to close at page
+    boundaries; consecutive windows share up to `overlap` tokens of context.
+    """
+    count = token_counter(tokenizer)
+    chunks = []
+    window = []  # (sentence, tokens) pairs
+    fresh = False  # Window holds text that has not been emitted yet
+
+    def size():
+        return sum(tokens for _, tokens in window)
+
+    def flush():
+        nonlocal window, fresh
+        chunks.append(' '.join(sentence for sentence, _ in window))
+        carried, carried_tokens = [], 0
+        for sentence, tokens in reversed(window):
+            if carried_tokens + tokens > overlap:
+                break
+            carried.insert(0, (sentence, tokens))
+            carried_tokens += tokens
+        window, fresh = carried, False
+
+    for page in pages:
+        for sentence in SENTENCE_END.split(' '.join(page.split())):
+            if not sentence:
+                continue
+            tokens = count(sentence)
+            if tokens <= max_tokens:
+                pieces = [(sentence, tokens)]
+            else:
+                pieces = [(piece, count(piece)) for piece in _split_long(sentence, max_tokens, count)]
+            for piece, piece_tokens in pieces:
+                if fresh and size() + piece_tokens > max_tokens:
+                    flush()
+                while window and size() + piece_tokens > max_tokens:
+                    window.pop(0)  # Overlap would push the window past the limit
+                window.append((piece, piece_tokens))
+                fresh = True
+        # Close half-full windows at the page break so chunks follow the document layout
+        if fresh and size() > max_tokens // 2:
+            flush()
+
+    if fresh:
+        flush()
+    return chunks
+
+
+def spread_order(num_chunks: int, count: int) -> List[int]:
+    """Chunk indices to draw prompts from: `count` evenly spaced chunks first,
+    then the rest, so retries land on text that has not been used yet."""
+    if num_chunks == 0:
+        return []
+    first = sorted({int(i * num_chunks / count) for i in range(min(count, num_chunks))})
+    used = set(first)
+    return first + [i for i in range(num_chunks) if i not in used]
+
@@ -3,4 +3,56 @@ import os
 import secrets
 
 # Generate a secure key if not exists
-SECRET_KEY = os.getenv("EDUQUEST1024029", secrets.token_hex(32))
\ No newline at end of file
+SECRET_KEY = os.getenv("EDUQUEST1024029", secrets.token_hex(32))
+
+# Model cache: memory budget (MB, 0 = unbounded), idle eviction (seconds, 0 = never)
+# and question types to load at startup, e.g. "MCQ,SHORT"
+MODEL_MEMORY_MB = float(os.getenv("EDUQUEST_MODEL_MEMORY_MB", "0")) or None
+MODEL_IDLE_SECONDS = float(os.getenv("EDUQUEST_MODEL_IDLE_SECONDS", "0")) or None
+PRELOAD_MODELS = [t for t in os.getenv("EDUQUEST_PRELOAD_MODELS", "").split(",") if t]
+
+# Hub revision for every model; pin to a commit so cached generations
+# are invalidated exactly when the weights change
+MODEL_REVISION = os.getenv("EDUQUEST_MODEL_REVISION", "main")
+
+# Optional out-of-process inference worker ("host:port" or a unix socket path).
+# When set, the app sends generation requests there instead of loading models.
+# The connection carries pickles, so the built-in key is only accepted on
+# loopback and unix socket addresses; anything reachable needs its own key.
+WORKER_ADDRESS = os.getenv("EDUQUEST_WORKER_ADDRESS", "")
+DEFAULT_WORKER_AUTHKEY = b"eduquest-local"
+WORKER_AUTHKEY = os.getenv("EDUQUEST_WORKER_AUTHKEY", "").encode() or DEFAULT_WORKER_AUTHKEY
+
+# Processes used to extract large PDFs (0 = one per CPU, 1 = always serial)
+PDF_WORKERS = int(os.getenv("EDUQUEST_PDF_WORKERS", "0")) or None
+# Processes running Tesseract on scanned pages (0 = one per CPU)
+OCR_WORKERS = int(os.getenv("EDUQUEST_OCR_WORKERS", "0")) or None
+
+# Session tokens expire after this many seconds; password hashing threads
+SESSION_MAX_AGE = int(os.getenv("EDUQUEST_SESSION_MAX_AGE", str(8 * 3600)))
+HASH_WORKERS = int(os.getenv("EDUQUEST_HASH_WORKERS", "4"))
+
+# Inference backend per question type: fp32 (default), int8 or onnx, e.g. "LONG=int8,MCQ=onnx"
+MODEL_BACKENDS = dict(item.split("=", 1) for item in os.getenv("EDUQUEST_MODEL_BACKENDS", "").split(",") if "=" in item)
+TORCH_THREADS = int(os.getenv("EDUQUEST_TORCH_THREADS", "1"))
+ONNX_CACHE_DIR = os.getenv("EDUQUEST_ONNX_CACHE_DIR", os.path.join(os.path.expanduser("~"), ".cache", "eduquest", "onnx"))
+
+# PDFs with embedded images are kept on disk by content hash so image handles stay
+# valid across sessions; least recently used files go past the cap (MB)
+PDF_SPILL_DIR = os.getenv("EDUQUEST_PDF_SPILL_DIR", os.path.join(os.path.expanduser("~"), ".cache", "eduquest", "pdf"))
+PDF_SPILL_MB = float(os.getenv("EDUQUEST_PDF_SPILL_MB", "2048"))
+
+# SQLite connections shared by all sessions; a thread waits when all are in use
+DB_POOL_SIZE = int(os.getenv("EDUQUEST_DB_POOL_SIZE", "8"))
+
+# Pipeline metrics: JSON log line per event, Prometheus text file and/or HTTP
+# endpoint (0 = off); users (by id, e.g. "1,2") who see the diagnostics page
+METRICS_LOG = os.getenv("EDUQUEST_METRICS_LOG", "").lower() in ("1", "true", "yes")
+METRICS_FILE = os.getenv("EDUQUEST_METRICS_FILE", "")
+METRICS_PORT = int(os.getenv("EDUQUEST_METRICS_PORT", "0"))
+ADMIN_USERS = {int(u) for u in os.getenv("EDUQUEST_ADMIN_USERS", "").split(",") if u.strip()}
+
+# Background generation jobs: concurrent jobs per process, and how long a
+# finished job stays available for re-attachment (seconds)
+JOB_WORKERS = int(os.getenv("EDUQUEST_JOB_WORKERS", "2"))
+JOB_RETENTION_SECONDS = float(os.getenv("EDUQUEST_JOB_RETENTION_SECONDS", "3600"))
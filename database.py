@@ -1,68 +1,451 @@
 # File: utils/database.py
 import sqlite3
+import threading
+import re
+import zlib
+from contextlib import contextmanager
 from datetime import datetime, timedelta
 import json
+from utils.config import DB_POOL_SIZE
+
+DB_PATH = 'eduquest.db'
+
+# Separates pages in the stored raw_text so page lists survive a round trip
+PAGE_BREAK = '\f'
+
+# content_pages rowid = content_id << PAGE_BITS | page number
+PAGE_BITS = 20
+
+_local = threading.local()
+_pools = {}
+_pools_lock = threading.Lock()
+
+class ConnectionPool:
+    """At most `size` connections to one database, shared by all threads.
+
+    Streamlit runs every rerun of a session's script in a new thread, so
+    per-thread connections would keep accumulating; pooled ones are reused
+    whichever thread asks.
+    """
+
+    def __init__(self, path, size=DB_POOL_SIZE):
+        self.path = path
+        self.size = size
+        self._idle = []
+        self._opened = 0
+        self._available = threading.Condition()
+
+    def _connect(self):
+        """New connection, tuned for many concurrent readers and short writes"""
+        conn = sqlite3.connect(self.path, timeout=30, cached_statements=256, check_same_thread=False)
+        conn.execute('PRAGMA journal_mode=WAL')  # Readers don't block the writer
+        conn.execute('PRAGMA synchronous=NORMAL')  # Safe with WAL, far fewer fsyncs
+        conn.execute('PRAGMA cache_size=-20000')  # ~20 MB page cache
+        conn.execute('PRAGMA temp_store=MEMORY')
+        conn.execute('PRAGMA busy_timeout=30000')
+        return conn
+
+    def acquire(self):
+        """An idle connection, a new one while under `size`, or wait for a release"""
+        with self._available:
+            while not self._idle and self._opened >= self.size:
+                self._available.wait()
+            if self._idle:
+                return self._idle.pop()
+            self._opened += 1
+        try:
+            return self._connect()
+        except Exception:
+            with self._available:
+                self._opened -= 1
+                self._available.notify()
+            raise
+
+    def release(self, conn):
+        if conn.in_transaction:
+            conn.rollback()  # Never hand out a connection with someone's open transaction
+        with self._available:
+            self._idle.append(conn)
+            self._available.notify()
+
+def _pool():
+    # Keyed by path so changing DB_PATH (CLI --db, tests) gets its own connections
+    with _pools_lock:
+        pool = _pools.get(DB_PATH)
+        if pool is None:
+            pool = _pools[DB_PATH] = ConnectionPool(DB_PATH)
+        return pool
+
+@contextmanager
+def connection():
+    """Borrow a pooled connection for the block.
+
+    Nested use on the same thread gets the connection already held, so a
+    helper called inside a transaction joins it instead of waiting on the pool.
+    """
+    conn = getattr(_local, 'conn', None)
+    if conn is not None:
+        yield conn
+        return
+    pool = _pool()
+    conn = pool.acquire()
+    _local.conn = conn
+    try:
+        yield conn
+    finally:
+        _local.conn = None
+        pool.release(conn)
+
+@contextmanager
+def transaction():
+    """Run a block of statements as one transaction on a pooled connection"""
+    with connection() as conn, conn:
+        yield conn
 
 def init_db():
     """Initialize database with advanced schema"""
-    conn = sqlite3.connect('eduquest.db')
-    c = conn.cursor()
+    with connection() as conn:
+        c = conn.cursor()
+    
+        # User Table with Preferences
+        c.execute('''CREATE TABLE IF NOT EXISTS users
+                     (id INTEGER PRIMARY KEY,
+                      username TEXT UNIQUE,
+                      password TEXT,
+                      email TEXT UNIQUE,
+                      preferences TEXT,
+                      created_at DATETIME,
+                      last_login DATETIME)''')
+    
+        # Content Table for PDF/text storage
+        c.execute('''CREATE TABLE IF NOT EXISTS content
+                     (content_id INTEGER PRIMARY KEY,
+                      user_id INTEGER,
+                      raw_text TEXT,
+                      processed_text TEXT,
+                      file_hash TEXT UNIQUE,
+                      upload_date DATETIME,
+                      FOREIGN KEY(user_id) REFERENCES users(id))''')
+    
+        # Everyone who uploaded a document; content.user_id only records the first,
+        # since identical files are stored once
+        owners_backfill = not c.execute('''SELECT 1 FROM sqlite_master WHERE name='content_owners' ''').fetchone()
+        c.execute('''CREATE TABLE IF NOT EXISTS content_owners
+                     (user_id INTEGER,
+                      content_id INTEGER,
+                      added_at DATETIME,
+                      PRIMARY KEY(user_id, content_id),
+                      FOREIGN KEY(user_id) REFERENCES users(id),
+                      FOREIGN KEY(content_id) REFERENCES content(content_id)) WITHOUT ROWID''')
+        if owners_backfill:
+            c.execute('''INSERT OR IGNORE INTO content_owners (user_id, content_id, added_at)
+                         SELECT user_id, content_id, upload_date FROM content WHERE user_id IS NOT NULL''')
+    
+        # Question Repository with Spaced Repetition
+        c.execute('''CREATE TABLE IF NOT EXISTS questions
+                     (question_id INTEGER PRIMARY KEY,
+                      content_id INTEGER,
+                      question_type TEXT CHECK(question_type IN 
+                        ('MCQ', 'SHORT', 'LONG', 'TRUE_FALSE')),
+                      question_text TEXT,
+                      correct_answer TEXT,
+                      options TEXT,
+                      difficulty INTEGER,
+                      next_review DATETIME,
+                      interval INTEGER,
+                      creation_date DATETIME,
+                      user_id INTEGER,
+                      FOREIGN KEY(content_id) REFERENCES content(content_id),
+                      FOREIGN KEY(user_id) REFERENCES users(id))''')
     
-    # User Table with Preferences
-    c.execute('''CREATE TABLE IF NOT EXISTS users
-                 (id INTEGER PRIMARY KEY,
-                  username TEXT UNIQUE,
-                  password TEXT,
-                  email TEXT UNIQUE,
-                  preferences TEXT,
-                  created_at DATETIME,
-                  last_login DATETIME)''')
+        # Questions are scheduled per owner; databases created before user_id existed get the column
+        columns = [row[1] for row in c.execute('PRAGMA table_info(questions)')]
+        if 'user_id' not in columns:
+            c.execute('ALTER TABLE questions ADD COLUMN user_id INTEGER REFERENCES users(id)')
     
-    # Content Table for PDF/text storage
-    c.execute('''CREATE TABLE IF NOT EXISTS content
-                 (content_id INTEGER PRIMARY KEY,
-                  user_id INTEGER,
-                  raw_text TEXT,
-                  processed_text TEXT,
-                  file_hash TEXT UNIQUE,
-                  upload_date DATETIME,
-                  FOREIGN KEY(user_id) REFERENCES users(id))''')
+        # Progress Tracking
+        c.execute('''CREATE TABLE IF NOT EXISTS progress
+                     (progress_id INTEGER PRIMARY KEY,
+                      user_id INTEGER,
+                      question_id INTEGER,
+                      attempts INTEGER,
+                      last_attempt DATETIME,
+                      success_rate REAL,
+                      FOREIGN KEY(user_id) REFERENCES users(id),
+                      FOREIGN KEY(question_id) REFERENCES questions(question_id))''')
     
-    # Question Repository with Spaced Repetition
-    c.execute('''CREATE TABLE IF NOT EXISTS questions
-                 (question_id INTEGER PRIMARY KEY,
-                  content_id INTEGER,
-                  question_type TEXT CHECK(question_type IN 
-                    ('MCQ', 'SHORT', 'LONG', 'TRUE_FALSE')),
-                  question_text TEXT,
-                  correct_answer TEXT,
-                  options TEXT,
-                  difficulty INTEGER,
-                  next_review DATETIME,
-                  interval INTEGER,
-                  creation_date DATETIME,
-                  FOREIGN KEY(content_id) REFERENCES content(content_id))''')
+        # Social Sharing
+        c.execute('''CREATE TABLE IF NOT EXISTS shared_content
+                     (share_id INTEGER PRIMARY KEY,
+                      user_id INTEGER,
+                      question_id INTEGER,
+                      share_date DATETIME,
+                      platform TEXT,
+                      FOREIGN KEY(user_id) REFERENCES users(id),
+                      FOREIGN KEY(question_id) REFERENCES questions(question_id))''')
     
-    # Progress Tracking
-    c.execute('''CREATE TABLE IF NOT EXISTS progress
-                 (progress_id INTEGER PRIMARY KEY,
-                  user_id INTEGER,
-                  question_id INTEGER,
-                  attempts INTEGER,
-                  last_attempt DATETIME,
-                  success_rate REAL,
-                  FOREIGN KEY(user_id) REFERENCES users(id),
-                  FOREIGN KEY(question_id) REFERENCES questions(question_id))''')
+        # Generation cache: pipeline outputs keyed by content, chunk, model and parameters
+        c.execute('''CREATE TABLE IF NOT EXISTS generation_cache
+                     (cache_key TEXT PRIMARY KEY,
+                      content_hash TEXT,
+                      question_type TEXT,
+                      model_id TEXT,
+                      result TEXT,
+                      created_at DATETIME)''')
+        c.execute('''CREATE INDEX IF NOT EXISTS idx_generation_cache_model
+                     ON generation_cache(question_type, model_id)''')
     
-    # Social Sharing
-    c.execute('''CREATE TABLE IF NOT EXISTS shared_content
-                 (share_id INTEGER PRIMARY KEY,
-                  user_id INTEGER,
-                  question_id INTEGER,
-                  share_date DATETIME,
-                  platform TEXT,
-                  FOREIGN KEY(user_id) REFERENCES users(id),
-                  FOREIGN KEY(question_id) REFERENCES questions(question_id))''')
+        # Sentence index built at ingestion (SentenceIndex.to_bytes), one per content row
+        c.execute('''CREATE TABLE IF NOT EXISTS sentence_index
+                     (content_id INTEGER PRIMARY KEY,
+                      data BLOB,
+                      created_at DATETIME,
+                      FOREIGN KEY(content_id) REFERENCES content(content_id))''')
     
-    conn.commit()
-    conn.close()
\ No newline at end of file
+        # Review scheduling: due queue is one range scan, progress rows are upserted per (user, question)
+        c.execute('''CREATE INDEX IF NOT EXISTS idx_questions_user_review
+                     ON questions(user_id, next_review)''')
+        c.execute('''CREATE INDEX IF NOT EXISTS idx_questions_content
+                     ON questions(content_id)''')
+        c.execute('''CREATE UNIQUE INDEX IF NOT EXISTS idx_progress_user_question
+                     ON progress(user_id, question_id)''')
+        c.execute('''CREATE INDEX IF NOT EXISTS idx_progress_question
+                     ON progress(question_id)''')
+    
+        # Page-level full-text index. Contentless: page bodies are stored (compressed)
+        # in content only, the index holds just the terms
+        backfill = not c.execute('''SELECT 1 FROM sqlite_master WHERE name='content_pages' ''').fetchone()
+        c.execute('''CREATE VIRTUAL TABLE IF NOT EXISTS content_pages
+                     USING fts5(body, content='', tokenize='porter unicode61')''')
+    
+        conn.commit()
+        if backfill:
+            # Content stored before the index existed
+            with transaction() as conn:
+                for content_id, raw_text in conn.execute('SELECT content_id, raw_text FROM content').fetchall():
+                    _index_pages(conn, content_id, unpack_text(raw_text))
+
+def pack_text(text):
+    """Compress a content body for storage"""
+    return zlib.compress(text.encode('utf-8'), 6)
+
+def unpack_text(value):
+    """Inverse of pack_text; rows written before compression hold plain text"""
+    if isinstance(value, bytes):
+        return zlib.decompress(value).decode('utf-8')
+    return value
+
+def _index_pages(conn, content_id, raw_text):
+    conn.executemany('INSERT INTO content_pages (rowid, body) VALUES (?, ?)',
+                     [((content_id << PAGE_BITS) | page_no, page)
+                      for page_no, page in enumerate(raw_text.split(PAGE_BREAK)) if page.strip()])
+
+def get_content_by_hash(file_hash):
+    """Return (content_id, raw_text, processed_text) for an already ingested file"""
+    with connection() as conn:
+        row = conn.execute('''SELECT content_id, raw_text, processed_text FROM content
+                              WHERE file_hash=?''', (file_hash,)).fetchone()
+    return (row[0], unpack_text(row[1]), unpack_text(row[2])) if row else None
+
+def get_content_for_user(file_hash, user_id):
+    """Like get_content_by_hash, plus whether user_id already owns the content,
+    in the same lookup: (content_id, raw_text, processed_text, owned) or None"""
+    with connection() as conn:
+        row = conn.execute('''SELECT c.content_id, c.raw_text, c.processed_text,
+                                     EXISTS(SELECT 1 FROM content_owners o
+                                            WHERE o.user_id=? AND o.content_id=c.content_id)
+                              FROM content c WHERE c.file_hash=?''', (user_id, file_hash)).fetchone()
+    return (row[0], unpack_text(row[1]), unpack_text(row[2]), bool(row[3])) if row else None
+
+def get_content_pages(content_id):
+    """Page texts of one stored document (only this row is decompressed)"""
+    with connection() as conn:
+        row = conn.execute('''SELECT raw_text FROM content WHERE content_id=?''', (content_id,)).fetchone()
+    return unpack_text(row[0]).split(PAGE_BREAK) if row else []
+
+def _insert_content(conn, user_id, raw_text, processed_text, file_hash, now):
+    """Insert one compressed content row and index its pages; if the hash exists,
+    only user_id is added to its owners"""
+    cursor = conn.execute('''INSERT OR IGNORE INTO content
+                             (user_id, raw_text, processed_text, file_hash, upload_date)
+                             VALUES (?, ?, ?, ?, ?)''',
+                          (user_id, pack_text(raw_text), pack_text(processed_text), file_hash, now))
+    if cursor.rowcount:
+        _index_pages(conn, cursor.lastrowid, raw_text)
+    if user_id is not None:
+        conn.execute('''INSERT OR IGNORE INTO content_owners (user_id, content_id, added_at)
+                        SELECT ?, content_id, ? FROM content WHERE file_hash=?''', (user_id, now, file_hash))
+
+def add_content_owners(rows):
+    """Record (user_id, content_id) pairs, e.g. a user uploading a file already stored"""
+    rows = [(user_id, content_id) for user_id, content_id in rows if user_id is not None]
+    if not rows:
+        return
+    now = datetime.now()
+    with transaction() as conn:
+        conn.executemany('''INSERT OR IGNORE INTO content_owners (user_id, content_id, added_at)
+                            VALUES (?, ?, ?)''', [(user_id, content_id, now) for user_id, content_id in rows])
+
+def save_content(user_id, raw_text, processed_text, file_hash):
+    """Store processed content and return its content_id"""
+    with transaction() as conn:
+        _insert_content(conn, user_id, raw_text, processed_text, file_hash, datetime.now())
+        # Another session may have stored the same file first
+        return conn.execute('''SELECT content_id FROM content WHERE file_hash=?''',
+                            (file_hash,)).fetchone()[0]
+
+def save_contents(rows):
+    """Bulk save_content for (user_id, raw_text, processed_text, file_hash) rows;
+    returns {file_hash: content_id}"""
+    if not rows:
+        return {}
+    now = datetime.now()
+    with transaction() as conn:
+        for user_id, raw_text, processed_text, file_hash in rows:
+            _insert_content(conn, user_id, raw_text, processed_text, file_hash, now)
+    return get_content_ids([row[3] for row in rows])
+
+def fts_query(text):
+    """Turn free text into an FTS5 query matching any of its words"""
+    return ' OR '.join(f'"{term}"' for term in re.findall(r'\w+', text.lower()))
+
+def search_pages(query, user_id=None, content_id=None, limit=20):
+    """Pages matching free text, best first, as (content_id, page_no, score).
+
+    Restrict to one document with content_id, or to one user's uploads with user_id.
+    """
+    match = fts_query(query)
+    if not match:
+        return []
+    sql = f'''SELECT rowid >> {PAGE_BITS}, rowid & {(1 << PAGE_BITS) - 1}, -rank
+              FROM content_pages WHERE content_pages MATCH ?'''
+    params = [match]
+    if content_id is not None:
+        sql += ' AND rowid BETWEEN ? AND ?'
+        params += [content_id << PAGE_BITS, ((content_id + 1) << PAGE_BITS) - 1]
+    if user_id is not None:
+        sql += f' AND rowid >> {PAGE_BITS} IN (SELECT content_id FROM content_owners WHERE user_id=?)'
+        params.append(user_id)
+    sql += ' ORDER BY rank LIMIT ?'
+    params.append(limit)
+    with connection() as conn:
+        return conn.execute(sql, params).fetchall()
+
+def get_content_ids(file_hashes):
+    """Return {file_hash: content_id} for the hashes already stored"""
+    ids = {}
+    hashes = list(file_hashes)
+    with connection() as conn:
+        for start in range(0, len(hashes), 500):  # Stay under SQLite's variable limit
+            batch = hashes[start:start + 500]
+            placeholders = ','.join('?' * len(batch))
+            ids.update(conn.execute(f'''SELECT file_hash, content_id FROM content
+                                         WHERE file_hash IN ({placeholders})''', batch).fetchall())
+    return ids
+
+def question_counts(content_ids):
+    """Return {content_id: {question_type: count}} for stored questions"""
+    counts = {}
+    ids = list(content_ids)
+    with connection() as conn:
+        for start in range(0, len(ids), 500):
+            batch = ids[start:start + 500]
+            placeholders = ','.join('?' * len(batch))
+            rows = conn.execute(f'''SELECT content_id, question_type, COUNT(*) FROM questions
+                                     WHERE content_id IN ({placeholders})
+                                     GROUP BY content_id, question_type''', batch).fetchall()
+            for content_id, q_type, count in rows:
+                counts.setdefault(content_id, {})[q_type] = count
+    return counts
+
+def _question_rows(content_id, questions, difficulty, user_id, now):
+    return [(content_id, q['type'], q['question'], q['answer'],
+             json.dumps(q['options']) if q.get('options') else None,
+             difficulty, now, 0, now, user_id)
+            for q in questions]
+
+_INSERT_QUESTION = '''INSERT INTO questions
+                       (content_id, question_type, question_text, correct_answer, options,
+                        difficulty, next_review, interval, creation_date, user_id)
+                       VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)'''
+
+def insert_question_sets(sets):
+    """Store several (content_id, questions, difficulty, user_id) sets in one transaction"""
+    now = datetime.now()
+    rows = [row for content_id, questions, difficulty, user_id in sets
+            for row in _question_rows(content_id, questions, difficulty, user_id, now)]
+    if not rows:
+        return
+    with transaction() as conn:
+        conn.executemany(_INSERT_QUESTION, rows)
+
+def insert_questions(content_id, questions, difficulty=None, user_id=None):
+    """Store a generated question set in one transaction; returns the new question_ids"""
+    rows = _question_rows(content_id, questions, difficulty, user_id, datetime.now())
+    if not rows:
+        return []
+    with transaction() as conn:
+        conn.executemany(_INSERT_QUESTION, rows)
+        # Rowids of one executemany inside a write transaction are consecutive
+        last_id = conn.execute('SELECT last_insert_rowid()').fetchone()[0]
+    return list(range(last_id - len(rows) + 1, last_id + 1))
+
+def insert_progress(rows):
+    """Merge (user_id, question_id, attempts, last_attempt, success_rate) rows into
+    progress; an existing row keeps a running success rate, as in record_session"""
+    if not rows:
+        return
+    with transaction() as conn:
+        conn.executemany('''INSERT INTO progress
+                            (user_id, question_id, attempts, last_attempt, success_rate)
+                            VALUES (?, ?, ?, ?, ?)
+                            ON CONFLICT(user_id, question_id) DO UPDATE SET
+                                success_rate=(success_rate * attempts + excluded.success_rate * excluded.attempts)
+                                             / (attempts + excluded.attempts),
+                                attempts=attempts + excluded.attempts,
+                                last_attempt=MAX(last_attempt, excluded.last_attempt)''', rows)
+
+def save_sentence_indexes(rows):
+    """Store (content_id, index_bytes) rows"""
+    if not rows:
+        return
+    now = datetime.now()
+    with transaction() as conn:
+        conn.executemany('''INSERT OR REPLACE INTO sentence_index (content_id, data, created_at)
+                            VALUES (?, ?, ?)''', [(content_id, data, now) for content_id, data in rows])
+
+def get_sentence_index(file_hash):
+    """Serialized sentence index for the content with this file hash, or None"""
+    with connection() as conn:
+        row = conn.execute('''SELECT s.data FROM sentence_index s
+                              JOIN content c ON c.content_id = s.content_id
+                              WHERE c.file_hash=?''', (file_hash,)).fetchone()
+    return row[0] if row else None
+
+def get_cached_generations(keys):
+    """Return {cache_key: result} for the keys present in the cache"""
+    if not keys:
+        return {}
+    placeholders = ','.join('?' * len(keys))
+    with connection() as conn:
+        rows = conn.execute(f'''SELECT cache_key, result FROM generation_cache
+                                WHERE cache_key IN ({placeholders})''', list(keys)).fetchall()
+    return {key: json.loads(result) for key, result in rows}
+
+def save_cached_generations(entries):
+    """Store (cache_key, content_hash, question_type, model_id, result) rows"""
+    if not entries:
+        return
+    now = datetime.now()
+    with transaction() as conn:
+        conn.executemany('''INSERT OR REPLACE INTO generation_cache
+                            (cache_key, content_hash, question_type, model_id, result, created_at)
+                            VALUES (?, ?, ?, ?, ?, ?)''',
+                         [(key, content_hash, q_type, model_id, json.dumps(result), now)
+                          for key, content_hash, q_type, model_id, result in entries])
+
+def purge_stale_generations(question_type, model_id):
+    """Drop cached outputs produced by any other version of this model"""
+    with transaction() as conn:
+        conn.execute('''DELETE FROM generation_cache
+                        WHERE question_type=? AND model_id!=?''', (question_type, model_id))
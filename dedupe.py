@@ -0,0 +1,94 @@
+# File: utils/dedupe.py
+"""Near-duplicate detection for generated questions.
+
+Each question is reduced to shingles of its normalized content tokens
+(single words by default: questions are short, so a reworded one still
+shares most of its words but few of its word pairs). A small MinHash
+signature and LSH bands turn the "seen anything similar?" check into a few
+dict lookups; only the candidates found there are compared exactly.
+
+Templated stems share most of their words, so the threshold is high: two
+questions that differ only in their subject ("... the role of mitochondria"
+vs "... of ribosomes") must both be kept.
+"""
+import re
+import zlib
+from typing import List, Set
+from utils.sentence_index import STOPWORDS
+
+_TOKEN = re.compile(r"[a-z0-9]+")
+# "i" is a pronoun to the sentence index but a numeral here ("World War I")
+_STOPWORDS = STOPWORDS - {'i'}
+_PRIME = (1 << 61) - 1
+_MASK = (1 << 32) - 1
+
+
+def normalized_tokens(text: str) -> List[str]:
+    """Lowercase content words; punctuation, case and stopwords don't make a question new"""
+    return [t for t in _TOKEN.findall(text.lower()) if t not in _STOPWORDS]
+
+
+def shingles(text: str, size: int = 1) -> Set[str]:
+    tokens = normalized_tokens(text)
+    if len(tokens) <= size:
+        return {' '.join(tokens)} if tokens else set()
+    return {' '.join(tokens[i:i + size]) for i in range(len(tokens) - size + 1)}
+
+
+class DuplicateFilter:
+    """Accepts a text unless its Jaccard similarity to one already accepted
+    reaches `threshold`"""
+
+    def __init__(self, threshold: float = 0.85, num_perm: int = 64, bands: int = 16):
+        if num_perm % bands:
+            raise ValueError("num_perm must be a multiple of bands")
+        self.threshold = threshold
+        self.bands = bands
+        self.rows = num_perm // bands
+        # Fixed coefficients keep signatures comparable across filters and runs
+        self._perms = [(2 * i + 1) * 0x9E3779B1 % _PRIME or 1 for i in range(num_perm)]
+        self._offsets = [(i * 0x85EBCA77 + 0xC2B2AE3D) % _PRIME for i in range(num_perm)]
+        self._buckets = {}
+        self._shingles = []
+        self.checked = 0
+        self.rejected = 0
+
+    def signature(self, text: str) -> List[int]:
+        return self._signature(shingles(text))
+
+    def _signature(self, items: Set[str]) -> List[int]:
+        hashes = [zlib.crc32(s.encode()) for s in items]
+        if not hashes:
+            return [_MASK] * len(self._perms)
+        return [min(((a * h + b) % _PRIME) & _MASK for h in hashes)
+                for a, b in zip(self._perms, self._offsets)]
+
+    def _bands(self, signature: List[int]):
+        for band in range(self.bands):
+            yield band, tuple(signature[band * self.rows:(band + 1) * self.rows])
+
+    def add(self, text: str) -> bool:
+        """Record text and return True if it is new, False if it is a near-duplicate"""
+        self.checked += 1
+        items = shingles(text)
+        signature = self._signature(items)
+        candidates = set()
+        for key in self._bands(signature):
+            candidates.update(self._buckets.get(key, ()))
+        for i in candidates:
+            other = self._shingles[i]
+            union = len(items | other)
+            # MinHash only finds candidates; the decision uses the exact overlap
+            if (len(items & other) / union if union else 1.0) >= self.threshold:
+                self.rejected += 1
+                return False
+        index = len(self._shingles)
+        self._shingles.append(items)
+        for key in self._bands(signature):
+            self._buckets.setdefault(key, []).append(index)
+        return True
+
+    @property
+    def rate(self) -> float:
+        """Share of checked texts rejected as duplicates"""
+        return self.rejected / self.checked if self.checked else 0.0
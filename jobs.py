@@ -0,0 +1,141 @@
+# File: utils/jobs.py
+"""Background question generation that outlives Streamlit reruns.
+
+A job runs on a process-wide thread pool, so a browser rerun (or a closed
+tab) doesn't lose the work; the page keeps only the job id in session state
+and re-attaches to it. Questions are appended to the job as each one passes
+validation, and the finished set is stored in one transaction.
+"""
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+import logging
+from utils.config import JOB_WORKERS, JOB_RETENTION_SECONDS
+from utils.database import insert_questions
+
+logger = logging.getLogger(__name__)
+
+# Prompts per request in the first generation round; later rounds double
+FIRST_ROUND_SIZE = 2
+
+
+class GenerationJob:
+    """State of one generation request, shared between the runner and the UI"""
+
+    def __init__(self, user_id, request: Dict, q_type: str, difficulty=None, content_id=None):
+        self.id = uuid.uuid4().hex
+        self.user_id = user_id
+        self.request = request  # {'context', 'count', 'pages', 'content_hash'}
+        self.q_type = q_type
+        self.difficulty = difficulty
+        self.content_id = content_id
+        self.status = 'queued'  # queued, running, done, failed, cancelled
+        self.error = None
+        self.questions: List[Dict] = []
+        self.created = time.time()
+        self.started = None
+        self.first_question_at = None
+        self.finished = None
+        self.cancel_event = threading.Event()
+        self._lock = threading.Lock()
+
+    @property
+    def count(self) -> int:
+        return self.request['count']
+
+    @property
+    def active(self) -> bool:
+        return self.status in ('queued', 'running')
+
+    def progress(self) -> float:
+        return min(1.0, len(self.questions) / self.count) if self.count else 1.0
+
+    def snapshot(self) -> List[Dict]:
+        """Copy of the questions so far, safe to render while the job runs"""
+        with self._lock:
+            return list(self.questions)
+
+    def cancel(self):
+        """Stop after the current batch; questions already accepted are kept"""
+        self.cancel_event.set()
+
+    def _add(self, index: int, question: Dict):
+        with self._lock:
+            if self.first_question_at is None:
+                self.first_question_at = time.time()
+            self.questions.append(question)
+
+
+class JobManager:
+    """Runs GenerationJobs in the background and keeps them for re-attachment"""
+
+    def __init__(self, generator_factory, workers: int = JOB_WORKERS,
+                 retention: float = JOB_RETENTION_SECONDS):
+        self.generator_factory = generator_factory  # Returns the shared generator
+        self.retention = retention  # Seconds a finished job stays available
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='generation-job')
+        self._jobs: Dict[str, GenerationJob] = {}
+        self._lock = threading.Lock()
+
+    def submit(self, user_id, context: str, q_type: str, count: int,
+               pages: Optional[List[str]] = None, content_hash: Optional[str] = None,
+               difficulty=None, content_id=None) -> GenerationJob:
+        if not context.strip():
+            raise ValueError("Context cannot be empty")
+        request = {'context': context, 'count': count, 'pages': pages, 'content_hash': content_hash}
+        job = GenerationJob(user_id, request, q_type, difficulty, content_id)
+        self._purge()
+        with self._lock:
+            self._jobs[job.id] = job
+        self._executor.submit(self._run, job)
+        return job
+
+    def get(self, job_id: Optional[str], user_id=None) -> Optional[GenerationJob]:
+        """Look up a job; with user_id, only that user's jobs are returned"""
+        job = self._jobs.get(job_id) if job_id else None
+        if job is None or (user_id is not None and job.user_id != user_id):
+            return None
+        return job
+
+    def active_for(self, user_id) -> List[GenerationJob]:
+        with self._lock:
+            return [job for job in self._jobs.values() if job.user_id == user_id and job.active]
+
+    def _run(self, job: GenerationJob):
+        if job.cancel_event.is_set():
+            job.status, job.finished = 'cancelled', time.time()
+            return
+        job.status, job.started = 'running', time.time()
+        try:
+            self.generator_factory().generate_many([job.request], job.q_type, on_question=job._add,
+                                                   cancel=job.cancel_event, round_size=FIRST_ROUND_SIZE)
+            self._store(job)
+            if job.cancel_event.is_set():
+                job.status = 'cancelled'
+            elif job.questions:
+                job.status = 'done'
+            else:
+                job.status = 'failed'
+                job.error = f"Failed to generate valid {job.q_type} questions after {job.count * 2} attempts"
+        except Exception as e:
+            logger.exception(f"Generation job {job.id} failed")
+            job.status, job.error = 'failed', str(e)
+        finally:
+            job.finished = time.time()
+
+    def _store(self, job: GenerationJob):
+        """Persist accepted questions (also those of a cancelled job) in one transaction"""
+        questions = job.snapshot()
+        if not (job.content_id and questions):
+            return
+        ids = insert_questions(job.content_id, questions, job.difficulty, user_id=job.user_id)
+        for question, question_id in zip(questions, ids):
+            question['question_id'] = question_id
+
+    def _purge(self):
+        cutoff = time.time() - self.retention
+        with self._lock:
+            for job_id in [k for k, job in self._jobs.items() if job.finished and job.finished < cutoff]:
+                del self._jobs[job_id]
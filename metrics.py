@@ -0,0 +1,216 @@
+# File: utils/metrics.py
+"""Per-stage timings and counters for the processing and generation pipeline.
+
+Code records into the process-wide `metrics` object; sinks receive every
+event as it happens (structured logs) or render the aggregated state
+(Prometheus text file / endpoint, the in-app diagnostics panel).
+Each process keeps its own numbers, so a separate inference worker
+should export through a file or port of its own.
+"""
+import json
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+import logging
+from utils.config import METRICS_LOG, METRICS_FILE, METRICS_PORT
+
+logger = logging.getLogger(__name__)
+
+
+def _key(name: str, labels: Dict) -> tuple:
+    return (name, tuple(sorted(labels.items())))
+
+
+def _quantile(ordered: List[float], q: float) -> float:
+    return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+
+
+class Metrics:
+    """Thread-safe counters and summaries (count, sum, max, recent-sample quantiles)"""
+
+    def __init__(self, sample_size: int = 512):
+        self.sample_size = sample_size  # Recent observations kept per series for p50/p95
+        self.sinks = []
+        self._counters = {}
+        self._summaries = {}
+        self._lock = threading.Lock()
+
+    def add_sink(self, sink):
+        """Sinks implement record(kind, name, value, labels); kind is 'counter' or 'summary'"""
+        self.sinks.append(sink)
+
+    def incr(self, name: str, value: float = 1, **labels):
+        if not value:
+            return
+        key = _key(name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+        self._emit('counter', name, value, labels)
+
+    def observe(self, name: str, value: float, **labels):
+        key = _key(name, labels)
+        with self._lock:
+            summary = self._summaries.get(key)
+            if summary is None:
+                summary = self._summaries[key] = {'count': 0, 'sum': 0.0, 'max': 0.0,
+                                                  'samples': deque(maxlen=self.sample_size)}
+            summary['count'] += 1
+            summary['sum'] += value
+            summary['max'] = max(summary['max'], value)
+            summary['samples'].append(value)
+        self._emit('summary', name, value, labels)
+
+    @contextmanager
+    def timer(self, name: str, **labels):
+        """Observe the wall time of the block as `name` (seconds), even if it raises"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def _emit(self, kind, name, value, labels):
+        for sink in self.sinks:
+            try:
+                sink.record(kind, name, value, labels)
+            except Exception as e:
+                logger.warning(f"Metrics sink {type(sink).__name__} failed: {e}")
+
+    def snapshot(self) -> Dict[str, List[Dict]]:
+        """Aggregated state: {'counters': [...], 'summaries': [...]}, one row per series"""
+        with self._lock:
+            counters = [{'name': name, 'labels': dict(labels), 'value': value}
+                        for (name, labels), value in sorted(self._counters.items())]
+            summaries = []
+            for (name, labels), summary in sorted(self._summaries.items()):
+                ordered = sorted(summary['samples'])
+                summaries.append({
+                    'name': name, 'labels': dict(labels),
+                    'count': summary['count'], 'sum': summary['sum'], 'max': summary['max'],
+                    'mean': summary['sum'] / summary['count'],
+                    'p50': _quantile(ordered, 0.5), 'p95': _quantile(ordered, 0.95),
+                })
+        return {'counters': counters, 'summaries': summaries}
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._summaries.clear()
+
+
+def timed_call(fn, *args):
+    """Pool task wrapper: returns (fn(*args), seconds) so the parent can record worker time"""
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+
+def _labels_text(labels: Dict, **extra) -> str:
+    items = {**labels, **extra}
+    if not items:
+        return ''
+    escaped = (str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for v in items.values())
+    return '{' + ','.join(f'{k}="{v}"' for k, v in zip(items, escaped)) + '}'
+
+
+def prometheus_text(source: Optional[Metrics] = None, prefix: str = 'eduquest_') -> str:
+    """Render counters and summaries in the Prometheus text exposition format"""
+    snap = (source or metrics).snapshot()
+    lines, typed = [], set()
+    for row in snap['counters']:
+        name = f"{prefix}{row['name']}_total"
+        if name not in typed:
+            typed.add(name)
+            lines.append(f"# TYPE {name} counter")
+        lines.append(f"{name}{_labels_text(row['labels'])} {row['value']}")
+    for row in snap['summaries']:
+        name = prefix + row['name']
+        if name not in typed:
+            typed.add(name)
+            lines.append(f"# TYPE {name} summary")
+        for q in ('0.5', '0.95'):
+            value = row['p50'] if q == '0.5' else row['p95']
+            lines.append(f"{name}{_labels_text(row['labels'], quantile=q)} {value:.6f}")
+        lines.append(f"{name}_sum{_labels_text(row['labels'])} {row['sum']:.6f}")
+        lines.append(f"{name}_count{_labels_text(row['labels'])} {row['count']}")
+    return '\n'.join(lines) + '\n'
+
+
+class LogSink:
+    """Writes every event as one JSON log line"""
+
+    def __init__(self, log: Optional[logging.Logger] = None):
+        self.log = log or logging.getLogger('eduquest.metrics')
+
+    def record(self, kind, name, value, labels):
+        self.log.info(json.dumps({'metric': name, 'kind': kind, 'value': value, **labels}))
+
+
+class PrometheusFileSink:
+    """Rewrites a Prometheus text file (e.g. for node_exporter's textfile collector),
+    at most once per `interval` seconds"""
+
+    def __init__(self, path: str, interval: float = 10.0, source: Optional[Metrics] = None):
+        self.path = path
+        self.interval = interval
+        self.source = source
+        self._written = 0.0
+        self._lock = threading.Lock()
+
+    def record(self, kind, name, value, labels):
+        now = time.monotonic()
+        if now - self._written < self.interval or not self._lock.acquire(blocking=False):
+            return
+        try:
+            self._written = now
+            self.flush()
+        finally:
+            self._lock.release()
+
+    def flush(self):
+        # Write then rename so scrapers never see a half-written file
+        tmp = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp, 'w') as f:
+            f.write(prometheus_text(self.source))
+        os.replace(tmp, self.path)
+
+
+def serve_prometheus(port: int, source: Optional[Metrics] = None, host: str = '0.0.0.0') -> ThreadingHTTPServer:
+    """Serve /metrics on a daemon thread"""
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split('?')[0] != '/metrics':
+                self.send_error(404)
+                return
+            body = prometheus_text(source).encode()
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/plain; version=0.0.4')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    threading.Thread(target=server.serve_forever, name='metrics-http', daemon=True).start()
+    logger.info(f"Serving metrics on http://{host}:{port}/metrics")
+    return server
+
+
+metrics = Metrics()
+
+if METRICS_LOG:
+    metrics.add_sink(LogSink())
+if METRICS_FILE:
+    metrics.add_sink(PrometheusFileSink(METRICS_FILE))
+if METRICS_PORT:
+    try:
+        serve_prometheus(METRICS_PORT)
+    except OSError as e:
+        # Another process (e.g. a second app instance) already owns the port
+        logger.warning(f"Metrics endpoint not started on port {METRICS_PORT}: {e}")
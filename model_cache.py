@@ -0,0 +1,174 @@
+# File: utils/model_cache.py
+import gc
+import threading
+import time
+import weakref
+from collections import OrderedDict
+from typing import Callable, Dict, Iterable, List, Optional
+import logging
+from utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+
+def estimate_size_mb(model) -> float:
+    """Approximate resident size of a pipeline's weights in MB"""
+    module = getattr(model, 'model', model)
+    if not hasattr(module, 'parameters'):
+        return 0.0
+    size = sum(p.numel() * p.element_size() for p in module.parameters())
+    if hasattr(module, 'buffers'):
+        size += sum(b.numel() * b.element_size() for b in module.buffers())
+    return size / (1024 * 1024)
+
+
+class _ByteCounter:
+    """Write-only file object that only counts what is written"""
+
+    def __init__(self):
+        self.size = 0
+
+    def write(self, data) -> int:
+        self.size += len(data)
+        return len(data)
+
+    def flush(self):
+        pass
+
+
+def serialized_size_mb(module) -> float:
+    """Size of a module's state_dict as torch.save writes it, in MB.
+
+    Covers weights that are neither parameters nor buffers, such as the
+    packed params of dynamically quantized layers.
+    """
+    import torch
+    counter = _ByteCounter()
+    torch.save(module.state_dict(), counter)
+    return counter.size / (1024 * 1024)
+
+
+def _sweep_idle(cache_ref, stop: threading.Event, interval: float):
+    """Sweep thread body; holds the cache only weakly so it can still be collected"""
+    while not stop.wait(interval):
+        cache = cache_ref()
+        if cache is None:
+            return
+        cache.evict_idle()
+        del cache
+
+
+class ModelCache:
+    """Loads model entries on first use and keeps them in a memory-bounded LRU"""
+
+    def __init__(self, loaders: Dict[str, Callable[[], Dict]],
+                 max_memory_mb: Optional[float] = None,
+                 idle_timeout: Optional[float] = None):
+        self.loaders = loaders
+        self.max_memory_mb = max_memory_mb  # None means unbounded
+        self.idle_timeout = idle_timeout  # Seconds before an unused model is dropped
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._load_locks = {key: threading.Lock() for key in loaders}
+        self._stop = threading.Event()
+        if idle_timeout:
+            # Requests sweep too, but an idle server makes none
+            threading.Thread(target=_sweep_idle, args=(weakref.ref(self), self._stop, max(1.0, idle_timeout / 4)),
+                             name='model-idle-sweep', daemon=True).start()
+
+    def __contains__(self, key) -> bool:
+        return key in self.loaders
+
+    def keys(self):
+        return self.loaders.keys()
+
+    def __getitem__(self, key: str) -> Dict:
+        if key not in self.loaders:
+            raise KeyError(key)
+        self.evict_idle()
+        entry = self._touch(key)
+        if entry is not None:
+            return entry
+
+        # Only one thread loads a given model; others wait for it
+        with self._load_locks[key]:
+            entry = self._touch(key)
+            if entry is None:
+                entry = self._load(key)
+        return entry
+
+    def _touch(self, key: str) -> Optional[Dict]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                entry['last_used'] = time.monotonic()
+            return entry
+
+    def _load(self, key: str) -> Dict:
+        start = time.perf_counter()
+        entry = self.loaders[key]()
+        if 'size_mb' not in entry:
+            entry['size_mb'] = estimate_size_mb(entry['model'])
+        entry['lock'] = threading.Lock()  # Serializes inference on this model
+        entry['last_used'] = time.monotonic()
+        elapsed = time.perf_counter() - start
+        metrics.observe('model_load_seconds', elapsed, q_type=key)
+        logger.info(f"Loaded {key} model ({entry['size_mb']:.0f} MB) in {elapsed:.1f}s")
+        with self._lock:
+            self._entries[key] = entry
+            evicted = self._enforce_budget(keep=key)
+        self._release(evicted)
+        return entry
+
+    def _enforce_budget(self, keep: str) -> List[str]:
+        """Drop least recently used models until we fit the budget (caller holds lock)"""
+        evicted = []
+        if self.max_memory_mb is None:
+            return evicted
+        while self.memory_mb() > self.max_memory_mb:
+            victim = next((k for k in self._entries if k != keep), None)
+            if victim is None:
+                logger.warning(f"{keep} model alone exceeds the {self.max_memory_mb} MB budget")
+                break
+            self._entries.pop(victim)
+            evicted.append(victim)
+        return evicted
+
+    def _release(self, evicted: List[str]):
+        if not evicted:
+            return
+        metrics.incr('model_evictions', len(evicted))
+        logger.info(f"Evicted models: {evicted}")
+        gc.collect()
+
+    def memory_mb(self) -> float:
+        return sum(entry['size_mb'] for entry in self._entries.values())
+
+    def loaded(self) -> List[str]:
+        with self._lock:
+            return list(self._entries)
+
+    def preload(self, keys: Iterable[str]):
+        """Warm the given question types ahead of the first request"""
+        for key in keys:
+            self[key]
+
+    def evict(self, key: str):
+        with self._lock:
+            removed = self._entries.pop(key, None)
+        self._release([key] if removed else [])
+
+    def close(self):
+        """Stop the idle sweep"""
+        self._stop.set()
+
+    def evict_idle(self):
+        if not self.idle_timeout:
+            return
+        cutoff = time.monotonic() - self.idle_timeout
+        with self._lock:
+            idle = [k for k, entry in self._entries.items() if entry['last_used'] < cutoff]
+            for key in idle:
+                self._entries.pop(key)
+        self._release(idle)
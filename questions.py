@@ -1,132 +1,524 @@
 # File: utils/questions.py
-from transformers import pipeline
-import torch
-from typing import List, Dict
+import importlib
+import os
+from collections import OrderedDict
+from pathlib import Path
+from typing import Callable, List, Dict, Iterable, Optional
 import logging
+import math
+import sqlite3
+import threading
+import time
+from utils.config import (MODEL_MEMORY_MB, MODEL_IDLE_SECONDS, PRELOAD_MODELS, MODEL_REVISION,
+                          MODEL_BACKENDS, TORCH_THREADS, ONNX_CACHE_DIR)
+from utils.model_cache import ModelCache, serialized_size_mb
+from utils.metrics import metrics
+from utils.chunking import chunk_pages, spread_order
+from utils.cache import GenerationCache, content_hash, make_key
+from utils.database import get_sentence_index
+from utils.sentence_index import SentenceIndex
+from utils.dedupe import DuplicateFilter
+from utils.lazy import LazyModule
+
+# torch/transformers take seconds to import; defer them until a generator is built
+torch = LazyModule('torch')
+transformers = LazyModule('transformers')
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+MODEL_NAMES = {
+    'MCQ': "google/flan-t5-base",
+    'SHORT': "distilbert-base-cased-distilled-squad",
+    'TRUE_FALSE': "cross-encoder/nli-deberta-v3-small",
+    'LONG': "facebook/bart-large-cnn",
+}
+
+# Pipeline task per question type
+MODEL_TASKS = {
+    'MCQ': "text2text-generation",
+    'SHORT': "question-answering",
+    'TRUE_FALSE': "text-classification",
+    'LONG': "summarization",
+}
+
+# CPU inference backends: full precision torch, dynamically quantized int8 torch, ONNX Runtime
+BACKENDS = ('fp32', 'int8', 'onnx')
+
+# optimum.onnxruntime model class per question type
+ONNX_MODEL_CLASSES = {
+    'MCQ': "ORTModelForSeq2SeqLM",
+    'SHORT': "ORTModelForQuestionAnswering",
+    'TRUE_FALSE': "ORTModelForSequenceClassification",
+    'LONG': "ORTModelForSeq2SeqLM",
+}
+
+# Chunk window per question type, in tokens of that type's model
+CHUNK_TOKENS = {'MCQ': 400, 'SHORT': 384, 'TRUE_FALSE': 256, 'LONG': 900}
+
+# Generation parameters per question type (also part of the cache key)
+GENERATION_PARAMS = {
+    'MCQ': {'max_length': 200},
+    'SHORT': {},
+    'TRUE_FALSE': {},
+    'LONG': {'max_length': 300, 'min_length': 100},
+}
+
+# How answers and distractors are picked from the model output; part of model_id,
+# so cached questions built the old way are dropped when it changes
+ANSWER_METHOD = 'sentence-index-1'
+
+# Windows per chunk: the chunk itself, then shifted by a third of its words each turn
+PROMPT_ROTATIONS = 3
+
+# Documents whose sentence index stays in memory
+SENTENCE_INDEX_CACHE_SIZE = 32
+
+# Generative types switch to sampling when a request's candidates start repeating;
+# each level raises the temperature
+SAMPLED_TYPES = ('MCQ', 'LONG')
+SAMPLING_PARAMS = {'do_sample': True, 'top_p': 0.92}
+MAX_SAMPLING_LEVEL = 3
+DUPLICATE_RATE_THRESHOLD = 0.25  # Share of a round's valid candidates that were duplicates
+
+def generation_params(q_type: str, level: int = 0) -> Dict:
+    """Pipeline keyword arguments for q_type at a sampling level (0 = the defaults)"""
+    if level <= 0 or q_type not in SAMPLED_TYPES:
+        return GENERATION_PARAMS[q_type]
+    return {**GENERATION_PARAMS[q_type], **SAMPLING_PARAMS, 'temperature': round(0.6 + 0.3 * level, 2)}
+
+def _patch_torch_classes():
+    """Torch patch: give torch._classes a __path__ so Streamlit's module scan doesn't trip on it"""
+    classes = importlib.import_module('torch._classes')
+    if not hasattr(classes, '__path__'):
+        classes.__path__ = [os.path.dirname(classes.__file__)]
+
 class QuestionGenerator:
-    def __init__(self):
-        torch.set_num_threads(1)  # Limit torch threads
-        self.device = "cuda" if torch.cuda.is_available() else "cpu"
-        logger.info(f"Using device: {self.device}")
-        self.models = self._load_models()
+    def __init__(self, batch_size: int = 8, overgenerate: float = 1.5,
+                 max_memory_mb: Optional[float] = MODEL_MEMORY_MB,
+                 idle_timeout: Optional[float] = MODEL_IDLE_SECONDS,
+                 preload: Iterable[str] = PRELOAD_MODELS,
+                 chunk_overlap: int = 32,
+                 cache: Optional[GenerationCache] = None, use_cache: bool = True,
+                 backends: Optional[Dict[str, str]] = None, num_threads: int = TORCH_THREADS,
+                 loaders: Optional[Dict[str, Callable[[], Dict]]] = None):
+        self.num_threads = num_threads
+        self.backends = dict(MODEL_BACKENDS if backends is None else backends)
+        for q_type, backend in self.backends.items():
+            if backend not in BACKENDS:
+                raise ValueError(f"Unknown backend {backend!r} for {q_type}. Choose from: {list(BACKENDS)}")
+        self.batch_size = batch_size  # Prompts per padded forward pass
+        self.overgenerate = overgenerate  # Candidates per missing question in each round
+        self.chunk_overlap = chunk_overlap  # Tokens shared by neighbouring chunks
+        self._device = None
+        self.models = self._load_models(max_memory_mb, idle_timeout, loaders)
+        self.cache = (cache or GenerationCache()) if use_cache else None
+        self._tokenizers = {}
+        self._indexes = OrderedDict()
+        self._index_lock = threading.Lock()
+        self.models.preload(preload)
+    
+    @property
+    def device(self) -> str:
+        """Configure torch on first use, so building a generator doesn't import it"""
+        if self._device is None:
+            _patch_torch_classes()
+            torch.set_num_threads(self.num_threads)  # Limit torch threads
+            self._device = "cuda" if torch.cuda.is_available() else "cpu"
+            logger.info(f"Using device: {self._device}")
+        return self._device
     
-    def _load_models(self):
-        """Load models with verified, stable alternatives"""
-        models = {
-            'MCQ': self._init_mcq_model(),
-            'SHORT': self._init_short_model(),
-            'TRUE_FALSE': self._init_truefalse_model(),
-            'LONG': self._init_long_model()  # New long answer option
+    def _load_models(self, max_memory_mb=None, idle_timeout=None, loaders=None):
+        """Register model loaders; each pipeline is built on first request.
+
+        Custom loaders (e.g. stub pipelines for benchmarks) replace the defaults.
+        """
+        self.custom_loaders = bool(loaders)
+        loaders = loaders or {
+            'MCQ': self._init_mcq_model,
+            'SHORT': self._init_short_model,
+            'TRUE_FALSE': self._init_truefalse_model,
+            'LONG': self._init_long_model  # New long answer option
         }
-        return models
+        return ModelCache(loaders, max_memory_mb=max_memory_mb, idle_timeout=idle_timeout)
     
     def _init_mcq_model(self):
         try:
-            return {
-                'model': pipeline("text2text-generation", model="google/flan-t5-base", device=0 if self.device == "cuda" else -1),
-                'type': 'pipeline'
-            }
+            return self._build_pipeline('MCQ')
         except Exception as e:
             logger.error(f"MCQ model initialization failed: {e}")
             raise RuntimeError("Failed to initialize MCQ generator")
 
     def _init_short_model(self):
         try:
-            return {
-                'model': pipeline("question-answering", model="distilbert-base-cased-distilled-squad", device=0 if self.device == "cuda" else -1),
-                'type': 'pipeline'
-            }
+            return self._build_pipeline('SHORT')
         except Exception as e:
             logger.error(f"Short answer model initialization failed: {e}")
             raise RuntimeError("Failed to initialize short answer generator")
 
     def _init_truefalse_model(self):
         try:
-            return {
-                'model': pipeline("text-classification", model="cross-encoder/nli-deberta-v3-small", device=0 if self.device == "cuda" else -1),
-                'type': 'pipeline'
-            }
+            return self._build_pipeline('TRUE_FALSE')
         except Exception as e:
             logger.error(f"True/False model initialization failed: {e}")
             raise RuntimeError("Failed to initialize true/false generator")
 
     def _init_long_model(self):
         try:
-            return {
-                'model': pipeline("summarization", model="facebook/bart-large-cnn", device=0 if self.device == "cuda" else -1),
-                'type': 'pipeline'
-            }
+            return self._build_pipeline('LONG')
         except Exception as e:
             logger.error(f"Long answer model initialization failed: {e}")
             raise RuntimeError("Failed to initialize long answer generator")
 
-    def generate_questions(self, context: str, q_type: str, count: int = 5) -> List[Dict]:
-        """Generate questions with robust error handling"""
-        if not context.strip():
-            raise ValueError("Context cannot be empty")
+    def backend(self, q_type: str) -> str:
+        backend = self.backends.get(q_type, 'fp32')
+        if backend == 'int8' and self.device == "cuda":
+            return 'fp32'  # Dynamic quantization is CPU-only
+        return backend
+
+    def _build_pipeline(self, q_type: str) -> Dict:
+        """Build the pipeline for q_type on its configured backend"""
+        backend = self.backend(q_type)
+        task, name = MODEL_TASKS[q_type], MODEL_NAMES[q_type]
+        device = 0 if self.device == "cuda" else -1
+        
+        if backend == 'onnx':
+            model, export_dir = self._load_onnx_model(q_type)
+            tokenizer = transformers.AutoTokenizer.from_pretrained(name, revision=MODEL_REVISION)
+            pipe = transformers.pipeline(task, model=model, tokenizer=tokenizer)
+            # ORT sessions expose no torch parameters; size them by their graph files
+            size_mb = sum(f.stat().st_size for f in Path(export_dir).rglob('*.onnx*')) / (1024 * 1024)
+            return {'model': pipe, 'type': 'pipeline', 'backend': backend, 'size_mb': size_mb}
+        else:
+            pipe = transformers.pipeline(task, model=name, revision=MODEL_REVISION, device=device)
+            if backend == 'int8':
+                # Linear layers hold nearly all the weights and FLOPs of these models
+                pipe.model = torch.quantization.quantize_dynamic(pipe.model, {torch.nn.Linear}, dtype=torch.qint8)
+                # Packed int8 weights aren't parameters or buffers, so estimate_size_mb would miss them
+                return {'model': pipe, 'type': 'pipeline', 'backend': backend,
+                        'size_mb': serialized_size_mb(pipe.model)}
+        return {'model': pipe, 'type': 'pipeline', 'backend': backend}
+
+    def _load_onnx_model(self, q_type: str):
+        """Load an exported ONNX Runtime graph, exporting it once into ONNX_CACHE_DIR"""
+        try:
+            onnxruntime = importlib.import_module('onnxruntime')
+            optimum_ort = importlib.import_module('optimum.onnxruntime')
+        except ImportError:
+            raise RuntimeError("The onnx backend needs: pip install optimum[onnxruntime]")
+        
+        model_class = getattr(optimum_ort, ONNX_MODEL_CLASSES[q_type])
+        options = onnxruntime.SessionOptions()
+        options.intra_op_num_threads = self.num_threads
+        export_dir = os.path.join(ONNX_CACHE_DIR, MODEL_NAMES[q_type].replace('/', '--'), MODEL_REVISION)
         
+        if os.path.isdir(export_dir):
+            return model_class.from_pretrained(export_dir, session_options=options), export_dir
+        model = model_class.from_pretrained(MODEL_NAMES[q_type], revision=MODEL_REVISION,
+                                            export=True, session_options=options)
+        model.save_pretrained(export_dir)
+        return model, export_dir
+
+    def generate_questions(self, context: str, q_type: str, count: int = 5,
+                           pages: Optional[List[str]] = None,
+                           content_hash: Optional[str] = None) -> List[Dict]:
+        """Generate questions with robust error handling"""
+        request = {'context': context, 'count': count, 'pages': pages, 'content_hash': content_hash}
+        questions = self.generate_many([request], q_type)[0]
+        if not questions:
+            raise RuntimeError(f"Failed to generate valid {q_type} questions after {count * 2} attempts")
+        return questions
+
+    def generate_many(self, requests: List[Dict], q_type: str,
+                      on_question: Optional[Callable[[int, Dict], None]] = None,
+                      cancel: Optional[threading.Event] = None,
+                      round_size: Optional[int] = None) -> List[List[Dict]]:
+        """Serve several requests ({'context', 'count', optional 'pages' and 'content_hash'}),
+        sharing pipeline batches between them.
+
+        Each document is split into model-sized chunks and the prompts are
+        spread over the whole text; retries rotate to chunks not used yet.
+        on_question(request_index, question) is called as each question passes
+        validation, and setting `cancel` stops before the next round. round_size
+        caps the prompts per request in the first round and doubles each round,
+        so streamed results start arriving before the full set is batched.
+        Returns one list per request; a list may be empty if every attempt failed.
+        """
         if q_type not in self.models:
             raise ValueError(f"Invalid question type: {q_type}. Choose from: {list(self.models.keys())}")
         
-        questions = []
-        attempts = 0
-        max_attempts = count * 2 
+        start = time.perf_counter()
+        states = []
+        for index, request in enumerate(requests):
+            context, count = request['context'], request['count']
+            if not context.strip():
+                raise ValueError("Context cannot be empty")
+            chunks = self._chunk(context, request.get('pages'), q_type)
+            doc_hash = request.get('content_hash') or content_hash(context)
+            states.append({'index': index, 'doc_hash': doc_hash, 'sentences': self.sentence_index(doc_hash, context),
+                           'uses': {}, 'chunks': chunks, 'order': spread_order(len(chunks), count), 'cursor': 0,
+                           'count': count, 'questions': [], 'attempts': 0, 'max_attempts': count * 2,
+                           'seen': DuplicateFilter(), 'level': 0, 'sent': set()})
+        
+        # Over-generate in bulk, then only re-batch the shortfall
+        while not (cancel and cancel.is_set()):
+            plan = []
+            for state in states:
+                needed = state['count'] - len(state['questions'])
+                remaining = state['max_attempts'] - state['attempts']
+                if needed <= 0 or remaining <= 0:
+                    continue
+                size = min(math.ceil(needed * self.overgenerate), remaining, round_size or remaining)
+                chunks = self._next_chunks(state, size, q_type)
+                if not chunks:
+                    continue  # Every distinct window was already sent at this decoding level
+                state['attempts'] += len(chunks)
+                plan.append((state, chunks))
+            if not plan:
+                break
+            if round_size:
+                round_size *= 2
+            
+            # Requests at different sampling levels need separate pipeline calls
+            levels = {}
+            for state, chunks in plan:
+                levels.setdefault(state['level'], []).append((state, chunks))
+            for level, group in sorted(levels.items()):
+                self._run_round(group, q_type, generation_params(q_type, level), on_question)
+        
+        for state in states:
+            accepted = min(len(state['questions']), state['count'])
+            metrics.incr('accepted_questions', accepted, q_type=q_type)
+            if accepted:
+                metrics.observe('attempts_per_question', state['attempts'] / accepted, q_type=q_type)
+            if state['seen'].checked:
+                metrics.observe('duplicate_rate', state['seen'].rate, q_type=q_type)
+        metrics.observe('generate_seconds', time.perf_counter() - start, q_type=q_type)
+        return [state['questions'][:state['count']] for state in states]
+
+    def _run_round(self, plan: List, q_type: str, params: Dict,
+                   on_question: Optional[Callable[[int, Dict], None]]):
+        """Generate one batch for [(state, chunks)], keeping valid candidates not seen before"""
+        contexts = [chunk for _, chunks in plan for chunk in chunks]
+        keys = [self._cache_key(state, chunk, q_type, params) for state, chunks in plan for chunk in chunks]
+        doc_hashes = [state['doc_hash'] for state, chunks in plan for _ in chunks]
+        indexes = [state['sentences'] for state, chunks in plan for _ in chunks]
+        metrics.incr('attempts', len(contexts), q_type=q_type)
+        try:
+            candidates = self._generate_cached(contexts, keys, doc_hashes, q_type, indexes, params)
+        except Exception as e:
+            metrics.incr('failed_attempts', len(contexts), q_type=q_type)
+            logger.warning(f"Batch of {len(contexts)} attempts failed: {e}")
+            return
+        
+        offset = 0
+        for state, chunks in plan:
+            batch = candidates[offset:offset + len(chunks)]
+            offset += len(chunks)
+            valid = [q for q in batch if self._validate_question(q)]
+            unique = [q for q in valid if state['seen'].add(q['question'])]
+            metrics.incr('rejected_questions', len(batch) - len(valid), q_type=q_type)
+            metrics.incr('duplicate_questions', len(valid) - len(unique), q_type=q_type)
+            if on_question:
+                for question in unique[:state['count'] - len(state['questions'])]:
+                    on_question(state['index'], question)
+            state['questions'].extend(unique)
+            
+            # Repeats mean the prompts are exhausted; vary the decoding for this request
+            if (valid and (len(valid) - len(unique)) / len(valid) > DUPLICATE_RATE_THRESHOLD
+                    and q_type in SAMPLED_TYPES and state['level'] < MAX_SAMPLING_LEVEL):
+                state['level'] += 1
+                state['cursor'] = 0  # Sampled output differs, so windows may be sent again
+                metrics.incr('sampling_escalations', q_type=q_type)
+
+    def model_id(self, q_type: str) -> str:
+        """Identifies the exact model behind q_type; changes invalidate cached output"""
+        if self.custom_loaders:
+            return f"custom/{q_type}"
+        return (f"{MODEL_NAMES[q_type]}@{MODEL_REVISION}/{self.backend(q_type)}"
+                f"/transformers-{transformers.__version__}/{ANSWER_METHOD}")
+
+    def _cache_key(self, state: Dict, chunk: str, q_type: str, params: Dict) -> str:
+        # Repeated use of a chunk within one request is a separate variant
+        variant = state['uses'].get(chunk, 0)
+        state['uses'][chunk] = variant + 1
+        return make_key(state['doc_hash'], chunk, q_type, self.model_id(q_type), params, variant)
+
+    def _generate_cached(self, contexts: List[str], keys: List[str],
+                         doc_hashes: List[str], q_type: str,
+                         indexes: Optional[List[SentenceIndex]] = None,
+                         params: Optional[Dict] = None) -> List[Dict]:
+        """Serve candidates from the generation cache, running the model only on misses"""
+        if self.cache is None:
+            return self._generate_batch(contexts, q_type, indexes, params)
+        indexes = indexes or [None] * len(contexts)
+        
+        model_id = self.model_id(q_type)
+        self.cache.invalidate_stale(q_type, model_id)
+        found = self.cache.get_many(keys, q_type, model_id)
+        hits = sum(key in found for key in keys)
+        metrics.incr('generation_cache', hits, q_type=q_type, result='hit')
+        metrics.incr('generation_cache', len(keys) - hits, q_type=q_type, result='miss')
         
-        while len(questions) < count and attempts < max_attempts:
-            attempts += 1
+        pending = {}
+        for key, context, doc_hash, index in zip(keys, contexts, doc_hashes, indexes):
+            if key not in found:
+                pending.setdefault(key, (context, doc_hash, index))
+        if pending:
+            generated = self._generate_batch([context for context, _, _ in pending.values()], q_type,
+                                             [index for _, _, index in pending.values()], params)
+            entries = [(key, doc_hash, q_type, model_id, result)
+                       for (key, (_, doc_hash, _)), result in zip(pending.items(), generated)]
+            self.cache.put_many(entries)
+            found.update({key: result for key, _, _, _, result in entries})
+        
+        return [dict(found[key]) for key in keys]
+
+    def _tokenizer(self, q_type: str):
+        """Tokenizer for chunking, without loading the full model if it isn't resident"""
+        if q_type in self.models.loaded():
+            return getattr(self.models[q_type]['model'], 'tokenizer', None)
+        if q_type not in self._tokenizers:
             try:
-                question = self._generate_question(context, q_type)
-                if self._validate_question(question):
-                    questions.append(question)
+                self._tokenizers[q_type] = transformers.AutoTokenizer.from_pretrained(MODEL_NAMES[q_type], revision=MODEL_REVISION)
             except Exception as e:
-                logger.warning(f"Attempt {attempts} failed: {e}")
+                logger.warning(f"Falling back to estimated token counts for {q_type}: {e}")
+                self._tokenizers[q_type] = None
+        return self._tokenizers[q_type]
+
+    def _chunk(self, context: str, pages: Optional[List[str]], q_type: str) -> List[str]:
+        """Split a document into windows sized for the q_type model"""
+        tokenizer = self._tokenizer(q_type)
+        chunks = chunk_pages(pages or [context], tokenizer,
+                             max_tokens=CHUNK_TOKENS[q_type], overlap=self.chunk_overlap)
+        return chunks or [context]
+
+    def _next_chunks(self, state: Dict, size: int, q_type: str) -> List[str]:
+        """Take up to `size` chunks in coverage order; once every chunk has been
+        used, further passes use shifted windows. Windows the request already sent
+        at its current decoding level are skipped, so the result is shorter (or
+        empty) once the distinct windows run out."""
+        order = state['order']
+        chunks = []
+        while len(chunks) < size and state['cursor'] < len(order) * PROMPT_ROTATIONS:
+            turn, slot = divmod(state['cursor'], len(order))
+            state['cursor'] += 1
+            chunk = self._rotated_chunk(state['chunks'], order[slot], turn, q_type)
+            key = (state['level'], content_hash(chunk))
+            if key in state['sent']:
                 continue
-        
-        if not questions:
-            raise RuntimeError(f"Failed to generate valid {q_type} questions after {max_attempts} attempts")
-        
-        return questions[:count]
+            state['sent'].add(key)
+            chunks.append(chunk)
+        return chunks
+
+    def _rotated_chunk(self, chunks: List[str], index: int, turn: int, q_type: str) -> str:
+        """Chunk `index` shifted forward by `turn` thirds of its words, continuing
+        into the next chunk so the window keeps its size"""
+        words = chunks[index].split()
+        shift = turn * len(words) // PROMPT_ROTATIONS
+        if not shift:
+            return chunks[index]
+        metrics.incr('rotated_prompts', q_type=q_type)
+        following = chunks[index + 1].split() if index + 1 < len(chunks) else words
+        return ' '.join(words[shift:] + following[:shift])
 
     def _generate_question(self, context: str, q_type: str) -> Dict:
         """Generate a single question based on type"""
-        context = context[:1000] 
+        return self._generate_batch([context], q_type)[0]
+
+    def sentence_index(self, doc_hash: str, text: str) -> SentenceIndex:
+        """Sentence index for a document: kept in memory, else the one stored at
+        ingestion, else built from text"""
+        with self._index_lock:
+            index = self._indexes.get(doc_hash)
+            if index is not None:
+                self._indexes.move_to_end(doc_hash)
+                return index
+        try:
+            data = get_sentence_index(doc_hash)
+        except sqlite3.Error as e:
+            logger.warning(f"Could not read stored sentence index: {e}")
+            data = None
+        index = SentenceIndex.from_bytes(data) if data else SentenceIndex.build(text)
+        with self._index_lock:
+            self._indexes[doc_hash] = index
+            while len(self._indexes) > SENTENCE_INDEX_CACHE_SIZE:
+                self._indexes.popitem(last=False)
+        return index
+
+    def _generate_batch(self, contexts: List[str], q_type: str,
+                        indexes: Optional[List[SentenceIndex]] = None,
+                        params: Optional[Dict] = None) -> List[Dict]:
+        """Run one padded batch of prompts through the pipeline for q_type"""
+        # Without document indexes, each context is its own document
+        indexes = indexes or [self.sentence_index(content_hash(context), context) for context in contexts]
+        entry = self.models[q_type]
+        # Pipelines are shared across sessions; run one batch per model at a time
+        with entry['lock'], metrics.timer('inference_seconds', q_type=q_type):
+            metrics.incr('inference_prompts', len(contexts), q_type=q_type)
+            return self._run_pipeline(entry['model'], contexts, q_type, indexes, params)
+
+    def _run_pipeline(self, model, contexts: List[str], q_type: str,
+                      indexes: List[SentenceIndex], params: Optional[Dict] = None) -> List[Dict]:
+        """Build prompts for q_type and parse the pipeline outputs"""
+        params = GENERATION_PARAMS[q_type] if params is None else params
         
         if q_type == 'MCQ':
-            prompt = f"Generate a multiple choice question about: {context}"
-            result = self.models['MCQ']['model'](prompt, max_length=200)
-            question = result[0]['generated_text']
-            answer = self._extract_answer(context, question)
-            return {'question': question, 'answer': answer, 'options': [answer] + self._generate_distractors(context, answer), 'type': 'MCQ'}
+            prompts = [f"Generate a multiple choice question about: {context}" for context in contexts]
+            results = model(prompts, truncation=True, batch_size=self.batch_size, **params)
+            questions = []
+            for context, index, result in zip(contexts, indexes, results):
+                question = result[0]['generated_text'] if isinstance(result, list) else result['generated_text']
+                answer = self._extract_answer(context, question, index)
+                questions.append({'question': question, 'answer': answer, 'options': [answer] + self._generate_distractors(context, answer, index), 'type': 'MCQ'})
+            return questions
         
         elif q_type == 'SHORT':
-            result = self.models['SHORT']['model'](question="What is a good question about this text?", context=context)
-            question = result['answer']
-            answer = self._extract_answer(context, question)
-            return {'question': question, 'answer': answer, 'type': 'SHORT'}
+            inputs = [{'question': "What is a good question about this text?", 'context': context} for context in contexts]
+            results = model(inputs, batch_size=self.batch_size, **params)
+            if isinstance(results, dict):
+                results = [results]
+            questions = []
+            for context, index, result in zip(contexts, indexes, results):
+                question = result['answer']
+                answer = self._extract_answer(context, question, index)
+                questions.append({'question': question, 'answer': answer, 'type': 'SHORT'})
+            return questions
         
         elif q_type == 'TRUE_FALSE':
-            result = self.models['TRUE_FALSE']['model'](f"This text: {context}", candidate_labels=["entailment", "contradiction"])
-            statement = result['sequence']
-            is_true = result['labels'][0] == "entailment"
-            return {'question': f"True or False: {statement}", 'answer': "True" if is_true else "False", 'type': 'TRUE_FALSE'}
+            inputs = [f"This text: {context}" for context in contexts]
+            results = model(inputs, candidate_labels=["entailment", "contradiction"], batch_size=self.batch_size,
+                            **params)
+            if isinstance(results, dict):
+                results = [results]
+            questions = []
+            for result in results:
+                statement = result['sequence']
+                is_true = result['labels'][0] == "entailment"
+                questions.append({'question': f"True or False: {statement}", 'answer': "True" if is_true else "False", 'type': 'TRUE_FALSE'})
+            return questions
         
         elif q_type == 'LONG':  # New Long Answer Option
-            result = self.models['LONG']['model'](context, max_length=300, min_length=100)
-            long_answer = result[0]['summary_text']
-            return {'question': f"Provide a detailed explanation of: {context[:100]}", 'answer': long_answer, 'type': 'LONG'}
+            results = model(contexts, truncation=True, batch_size=self.batch_size, **params)
+            questions = []
+            for context, result in zip(contexts, results):
+                long_answer = result['summary_text'] if isinstance(result, dict) else result[0]['summary_text']
+                questions.append({'question': f"Provide a detailed explanation of: {context[:100]}", 'answer': long_answer, 'type': 'LONG'})
+            return questions
 
-    def _extract_answer(self, context: str, question: str) -> str:
-        """Simple answer extraction (override with better logic)"""
-        return context.split('.')[0].strip() or "Answer not found"
+    def _extract_answer(self, context: str, question: str, index: Optional[SentenceIndex] = None) -> str:
+        """Document sentence closest to the question, else the context's first sentence"""
+        answer = index.answer(question) if index is not None else None
+        return answer or context.split('.')[0].strip() or "Answer not found"
 
-    def _generate_distractors(self, context: str, correct: str) -> List[str]:
-        """Generate plausible wrong answers"""
-        return ["None of the above", "All of the above", "The text doesn't say"]
+    def _generate_distractors(self, context: str, correct: str,
+                              index: Optional[SentenceIndex] = None) -> List[str]:
+        """Sentences near the answer in the document index, padded with generic options"""
+        distractors = index.distractors(correct) if index is not None else []
+        distractors = [d for d in distractors if d != correct]
+        fallback = ["None of the above", "All of the above", "The text doesn't say"]
+        return (distractors + fallback)[:3]
 
     def _validate_question(self, question: Dict) -> bool:
         """Quality checks for generated questions"""
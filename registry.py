@@ -0,0 +1,83 @@
+# File: utils/registry.py
+"""Process-wide components shared by every Streamlit session and rerun.
+
+Streamlit re-executes app.py on each interaction, but imported modules stay
+in sys.modules, so anything held here is created once per server process.
+"""
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+_instances = {}
+_locks = {}
+_registry_lock = threading.Lock()
+
+
+def _get(name, factory):
+    if name in _instances:
+        return _instances[name]
+    with _registry_lock:
+        lock = _locks.setdefault(name, threading.Lock())
+    with lock:
+        if name not in _instances:
+            _instances[name] = factory()
+    return _instances[name]
+
+
+def ensure_database():
+    """Create the schema once per process"""
+    from utils.database import init_db
+    return _get('database', init_db)
+
+
+def get_auth_system():
+    from utils.auth import AuthSystem
+    return _get('auth', AuthSystem)
+
+
+def get_content_processor():
+    from utils.processors import ContentProcessor
+    return _get('processor', ContentProcessor)
+
+
+def get_review_scheduler():
+    from utils.review import ReviewScheduler
+    return _get('review', ReviewScheduler)
+
+
+def get_question_generator():
+    """Local generator, or a client for the inference worker when one is configured"""
+    from utils.config import WORKER_ADDRESS
+    if WORKER_ADDRESS:
+        from utils.worker import InferenceClient, parse_address
+        return _get('qgen', lambda: InferenceClient(parse_address(WORKER_ADDRESS)))
+    from utils.questions import QuestionGenerator
+    return _get('qgen', QuestionGenerator)
+
+
+def _warm_up():
+    try:
+        get_question_generator()  # Building the generator preloads PRELOAD_MODELS
+    except Exception:
+        logger.exception("Model warm-up failed; models will load on first request")
+
+
+def start_model_warmup():
+    """Build the generator on a background thread once per process, so
+    PRELOAD_MODELS are loaded before the first request instead of during it"""
+    from utils.config import PRELOAD_MODELS, WORKER_ADDRESS
+    if not PRELOAD_MODELS or WORKER_ADDRESS:
+        return None  # Nothing to warm, or the worker loads its own models
+
+    def start():
+        thread = threading.Thread(target=_warm_up, name='model-warmup', daemon=True)
+        thread.start()
+        return thread
+    return _get('warmup', start)
+
+
+def get_job_manager():
+    """Background generation jobs, run against the shared question generator"""
+    from utils.jobs import JobManager
+    return _get('jobs', lambda: JobManager(get_question_generator))
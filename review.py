@@ -0,0 +1,81 @@
+# File: utils/review.py
+import json
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from utils.database import connection, transaction
+
+MAX_INTERVAL_DAYS = 365
+RELEARN_DELAY = timedelta(minutes=10)  # Missed questions come back within the same day
+
+
+class ReviewScheduler:
+    """Spaced-repetition queue over the questions and progress tables.
+
+    Relies on the (user_id, next_review) index on questions, so the due
+    queue is a single index range scan regardless of table size.
+    """
+
+    def due_questions(self, user_id: int, now: Optional[datetime] = None, limit: int = 50) -> List[Dict]:
+        """Questions owned by user_id whose next_review has passed, oldest first"""
+        with connection() as conn:
+            rows = conn.execute('''SELECT question_id, question_type, question_text,
+                                          correct_answer, options, next_review, interval
+                                   FROM questions
+                                   WHERE user_id=? AND next_review<=?
+                                   ORDER BY next_review
+                                   LIMIT ?''', (user_id, now or datetime.now(), limit)).fetchall()
+        return [{
+            'question_id': question_id,
+            'type': q_type,
+            'question': text,
+            'answer': answer,
+            'options': json.loads(options) if options else None,
+            'next_review': next_review,
+            'interval': interval or 0
+        } for question_id, q_type, text, answer, options, next_review, interval in rows]
+
+    def due_count(self, user_id: int, now: Optional[datetime] = None) -> int:
+        with connection() as conn:
+            return conn.execute('''SELECT COUNT(*) FROM questions
+                                   WHERE user_id=? AND next_review<=?''',
+                                (user_id, now or datetime.now())).fetchone()[0]
+
+    @staticmethod
+    def next_interval(interval: int, correct: bool) -> int:
+        """Days until the next review: doubles on success, resets on a miss"""
+        if not correct:
+            return 0
+        return min(max(interval * 2, 1), MAX_INTERVAL_DAYS)
+
+    def record_session(self, user_id: int, results: Iterable[Tuple[int, bool]],
+                       now: Optional[datetime] = None):
+        """Apply a whole review session of (question_id, correct) answers in one transaction"""
+        now = now or datetime.now()
+        results = dict(results)
+        if not results:
+            return
+
+        with transaction() as conn:
+            placeholders = ','.join('?' * len(results))
+            intervals = dict(conn.execute(f'''SELECT question_id, interval FROM questions
+                                              WHERE question_id IN ({placeholders})''',
+                                          list(results)).fetchall())
+            updates = []
+            for question_id, correct in results.items():
+                interval = self.next_interval(intervals.get(question_id) or 0, correct)
+                next_review = now + (timedelta(days=interval) if interval else RELEARN_DELAY)
+                updates.append((interval, next_review, question_id))
+            conn.executemany('''UPDATE questions SET interval=?, next_review=?
+                                WHERE question_id=?''', updates)
+
+            # Running success rate per (user, question)
+            conn.executemany('''INSERT INTO progress
+                                (user_id, question_id, attempts, last_attempt, success_rate)
+                                VALUES (?, ?, 1, ?, ?)
+                                ON CONFLICT(user_id, question_id) DO UPDATE SET
+                                    success_rate=(success_rate * attempts + excluded.success_rate) / (attempts + 1),
+                                    attempts=attempts + 1,
+                                    last_attempt=excluded.last_attempt''',
+                             [(user_id, question_id, now, 1.0 if correct else 0.0)
+                              for question_id, correct in results.items()])
@@ -0,0 +1,127 @@
+# File: utils/sentence_index.py
+"""Per-document sentence index for answer lookup and distractor selection.
+
+Sentences are embedded once, at ingestion, as L2-normalized hashed TF-IDF
+vectors (unigrams and bigrams hashed into `dim` buckets, IDF taken from the
+document's own sentences). No model is involved, so building the index and
+querying it are plain NumPy: a question or answer is one matrix-vector
+product against the stored matrix.
+"""
+import io
+import json
+import re
+import zlib
+from typing import List, Optional
+from utils.lazy import LazyModule
+
+np = LazyModule('numpy')
+
+INDEX_DIM = 512
+MIN_SENTENCE_CHARS = 20
+MAX_SENTENCE_CHARS = 300
+
+_SENTENCE_END = re.compile(r'(?<=[.!?])\s+(?=["\'(\[]?[A-Z0-9])')
+_TOKEN = re.compile(r"[a-z0-9]+")
+STOPWORDS = frozenset("""
+a about above after again all also an and any are as at be because been before being below
+between both but by can could did do does doing down during each few for from further had has
+have having he her here hers him his how i if in into is it its itself just me more most my no
+nor not now of off on once only or other our out over own same she should so some such than that
+the their them then there these they this those through to too under until up very was we were
+what when where which while who whom why will with would you your
+""".split())
+
+
+def split_sentences(text: str) -> List[str]:
+    """Sentences of usable length; PDF line breaks inside a sentence are joined"""
+    text = re.sub(r'\s+', ' ', text).strip()
+    sentences = (s.strip() for s in _SENTENCE_END.split(text))
+    return [s for s in sentences if MIN_SENTENCE_CHARS <= len(s) <= MAX_SENTENCE_CHARS]
+
+
+def _features(text: str) -> List[str]:
+    tokens = [t for t in _TOKEN.findall(text.lower()) if t not in STOPWORDS and len(t) > 1]
+    return tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+
+
+def hashed_counts(texts: List[str], dim: int = INDEX_DIM):
+    """(len(texts), dim) float32 matrix of feature counts, one row per text"""
+    rows, cols = [], []
+    for row, text in enumerate(texts):
+        for feature in _features(text):
+            rows.append(row)
+            cols.append(zlib.crc32(feature.encode()) % dim)
+    counts = np.zeros((len(texts), dim), np.float32)
+    np.add.at(counts, (np.array(rows, np.intp), np.array(cols, np.intp)), 1.0)
+    return counts
+
+
+def _normalize(matrix):
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return matrix / np.maximum(norms, 1e-9)
+
+
+class SentenceIndex:
+    """Sentences of one document and their embedding matrix"""
+
+    def __init__(self, sentences: List[str], vectors, idf):
+        self.sentences = sentences
+        self.vectors = vectors  # (n, dim) float32, rows L2-normalized
+        self.idf = idf  # (dim,) float32 weights shared by queries
+
+    def __len__(self):
+        return len(self.sentences)
+
+    @classmethod
+    def build(cls, text: str, dim: int = INDEX_DIM) -> 'SentenceIndex':
+        sentences = list(dict.fromkeys(split_sentences(text)))  # Repeated headers/footers once
+        counts = hashed_counts(sentences, dim)
+        df = (counts > 0).sum(axis=0)
+        idf = (np.log((1 + len(sentences)) / (1 + df)) + 1).astype(np.float32)
+        return cls(sentences, _normalize(np.log1p(counts) * idf), idf)
+
+    def embed(self, texts: List[str]):
+        """Query vectors in the index's space"""
+        return _normalize(np.log1p(hashed_counts(texts, self.idf.shape[0])) * self.idf)
+
+    def top_k(self, query, k: int, exclude=None):
+        """Indices and cosine scores of the k sentences nearest one query vector"""
+        scores = self.vectors @ query
+        if exclude is not None:
+            scores[exclude] = -1.0
+        k = min(k, len(scores))
+        if k <= 0:
+            return np.zeros(0, np.intp), np.zeros(0, np.float32)
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return top, scores[top]
+
+    def answer(self, question: str) -> Optional[str]:
+        """Sentence that best matches the question, or None if nothing overlaps"""
+        if not self.sentences:
+            return None
+        top, scores = self.top_k(self.embed([question])[0], 1)
+        return self.sentences[top[0]] if scores[0] > 0 else None
+
+    def distractors(self, answer: str, count: int = 3, max_similarity: float = 0.8) -> List[str]:
+        """Sentences on the same topic as the answer but not restating it"""
+        if not self.sentences:
+            return []
+        query = self.embed([answer])[0]
+        # Restatements of the answer would be correct options, so leave them out
+        near = (self.vectors @ query) >= max_similarity
+        top, scores = self.top_k(query, count, exclude=near)
+        return [self.sentences[i] for i, score in zip(top, scores) if score > 0]
+
+    def to_bytes(self) -> bytes:
+        buffer = io.BytesIO()
+        # Rows are sparse, so the compressed archive is a small fraction of n * dim
+        np.savez_compressed(buffer, vectors=self.vectors.astype(np.float16), idf=self.idf,
+                            sentences=np.frombuffer(json.dumps(self.sentences).encode(), np.uint8))
+        return buffer.getvalue()
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> 'SentenceIndex':
+        with np.load(io.BytesIO(data)) as archive:
+            sentences = json.loads(archive['sentences'].tobytes().decode())
+            return cls(sentences, archive['vectors'].astype(np.float32), archive['idf'])
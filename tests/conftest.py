@@ -0,0 +1,17 @@
+# File: utils/tests/conftest.py
+import sys
+from pathlib import Path
+
+import pytest
+
+# Modules import each other as utils.*; make the directory holding utils/ importable
+sys.path.insert(0, str(Path(__file__).parents[2]))
+
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    """Fresh schema in a temporary file; the app's eduquest.db is never touched"""
+    from utils import database
+    monkeypatch.setattr(database, 'DB_PATH', str(tmp_path / 'test.db'))
+    database.init_db()
+    return database
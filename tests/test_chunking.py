@@ -0,0 +1,48 @@
+# File: utils/tests/test_chunking.py
+from utils.chunking import chunk_pages, spread_order, token_counter
+
+SENTENCE = "Mitochondria release energy from glucose through cellular respiration."
+
+
+def test_chunks_stay_within_max_tokens():
+    count = token_counter()
+    chunks = chunk_pages([' '.join([SENTENCE] * 40)], max_tokens=64, overlap=16)
+    assert len(chunks) > 1
+    assert all(count(chunk) <= 64 for chunk in chunks)
+
+
+def test_consecutive_chunks_overlap():
+    sentences = [f"Sentence number {i} describes part {i} of the cell." for i in range(30)]
+    chunks = chunk_pages([' '.join(sentences)], max_tokens=40, overlap=16)
+    for previous, current in zip(chunks, chunks[1:]):
+        last = previous.split('. ')[-1]
+        assert last in current
+
+
+def test_no_overlap_means_no_repeated_sentences():
+    sentences = [f"Sentence number {i} describes part {i} of the cell." for i in range(30)]
+    chunks = chunk_pages([' '.join(sentences)], max_tokens=40, overlap=0)
+    joined = ' '.join(chunks)
+    assert all(joined.count(f"number {i} ") == 1 for i in range(30))
+
+
+def test_long_sentence_is_split():
+    sentence = ' '.join(['word'] * 200) + '.'
+    chunks = chunk_pages([sentence], max_tokens=50, overlap=0)
+    assert len(chunks) > 1
+    assert sum(len(chunk.split()) for chunk in chunks) == 200
+
+
+def test_empty_pages_give_no_chunks():
+    assert chunk_pages(['', '   ']) == []
+
+
+def test_spread_order_covers_every_chunk_once():
+    order = spread_order(10, 3)
+    assert order[:3] == [0, 3, 6]
+    assert sorted(order) == list(range(10))
+
+
+def test_spread_order_edge_cases():
+    assert spread_order(0, 5) == []
+    assert spread_order(3, 10) == [0, 1, 2]
@@ -0,0 +1,49 @@
+# File: utils/tests/test_dedupe.py
+import pytest
+
+from utils.dedupe import DuplicateFilter, normalized_tokens, shingles
+
+
+def test_normalized_tokens_drop_case_punctuation_and_stopwords():
+    assert normalized_tokens("What is the role of the Nucleus?") == ['role', 'nucleus']
+
+
+def test_shingles_of_short_text():
+    assert shingles("The nucleus", size=2) == {'nucleus'}
+    assert shingles("the of and") == set()
+
+
+def test_exact_and_reworded_duplicates_are_rejected():
+    seen = DuplicateFilter()
+    assert seen.add("What is the function of the mitochondria in a cell?")
+    assert not seen.add("What is the function of the mitochondria in a cell?")
+    assert not seen.add("what is THE function of mitochondria in the cell")
+    assert seen.checked == 3 and seen.rejected == 2
+
+
+def test_distinct_questions_are_accepted():
+    seen = DuplicateFilter()
+    questions = ["What is the function of the mitochondria in a cell?",
+                 "Which organelle stores genetic information?",
+                 "How do ribosomes assemble proteins from amino acids?"]
+    assert all(seen.add(q) for q in questions)
+    assert seen.rate == 0.0
+
+
+def test_questions_differing_only_in_subject_are_accepted():
+    seen = DuplicateFilter()
+    assert seen.add("Which of the following best describes the role of mitochondria in cellular respiration?")
+    assert seen.add("Which of the following best describes the role of ribosomes in cellular respiration?")
+    assert seen.add("When did World War II end in Europe?")
+    assert seen.add("When did World War I end in Europe?")
+    assert seen.rejected == 0
+
+
+def test_signatures_are_stable_across_filters():
+    text = "Mitochondria release energy from glucose"
+    assert DuplicateFilter().signature(text) == DuplicateFilter().signature(text)
+
+
+def test_num_perm_must_divide_into_bands():
+    with pytest.raises(ValueError):
+        DuplicateFilter(num_perm=64, bands=10)
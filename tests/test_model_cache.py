@@ -0,0 +1,27 @@
+# File: utils/tests/test_model_cache.py
+import time
+
+from utils.model_cache import ModelCache
+
+
+def _cache(**kwargs):
+    return ModelCache({key: (lambda: {'model': object(), 'size_mb': 10.0}) for key in ('MCQ', 'SHORT')}, **kwargs)
+
+
+def test_least_recently_used_model_is_evicted_over_budget():
+    cache = _cache(max_memory_mb=15)
+    cache['MCQ']
+    cache['SHORT']
+    assert cache.loaded() == ['SHORT']
+
+
+def test_idle_models_are_dropped_without_further_requests():
+    cache = _cache(idle_timeout=0.2)
+    try:
+        cache['MCQ']
+        deadline = time.monotonic() + 5
+        while cache.loaded() and time.monotonic() < deadline:
+            time.sleep(0.1)
+        assert cache.loaded() == []
+    finally:
+        cache.close()
@@ -0,0 +1,33 @@
+# File: utils/tests/test_questions.py
+from utils.chunking import spread_order
+from utils.questions import PROMPT_ROTATIONS, QuestionGenerator
+
+TEXT = ("Mitochondria release energy from glucose through cellular respiration. "
+        "The nucleus stores genetic information and controls the activities of the cell.")
+
+
+def _generator():
+    return QuestionGenerator(use_cache=False, preload=[], loaders={'SHORT': dict})
+
+
+def _state(chunks, count):
+    return {'chunks': chunks, 'order': spread_order(len(chunks), count), 'cursor': 0, 'level': 0, 'sent': set()}
+
+
+def test_next_chunks_never_resends_a_window():
+    qgen = _generator()
+    state = _state([TEXT], 5)
+    first = qgen._next_chunks(state, 2, 'SHORT')
+    rest = qgen._next_chunks(state, 10, 'SHORT')
+    sent = first + rest
+    assert first[0] == TEXT
+    assert len(sent) == len(set(sent)) == PROMPT_ROTATIONS
+    assert qgen._next_chunks(state, 5, 'SHORT') == []
+
+
+def test_windows_are_sent_again_at_a_new_sampling_level():
+    qgen = _generator()
+    state = _state([TEXT], 5)
+    qgen._next_chunks(state, 10, 'SHORT')
+    state['level'], state['cursor'] = 1, 0
+    assert qgen._next_chunks(state, 1, 'SHORT') == [TEXT]
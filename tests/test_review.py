@@ -0,0 +1,68 @@
+# File: utils/tests/test_review.py
+from datetime import datetime, timedelta
+
+from utils.review import RELEARN_DELAY, ReviewScheduler
+
+NOW = datetime(2026, 1, 1, 9, 0)
+
+
+def _questions(db, count, user_id=1):
+    content_id = db.save_content(user_id, 'page', 'page', 'hash')
+    questions = [{'type': 'SHORT', 'question': f"Question {i}?", 'answer': f"Answer {i}"}
+                 for i in range(count)]
+    return db.insert_questions(content_id, questions, user_id=user_id)
+
+
+def _state(db, question_id):
+    with db.connection() as conn:
+        return conn.execute('SELECT interval, next_review FROM questions WHERE question_id=?',
+                            (question_id,)).fetchone()
+
+
+def _progress(db, question_id):
+    with db.connection() as conn:
+        return conn.execute('SELECT attempts, success_rate FROM progress WHERE question_id=?',
+                            (question_id,)).fetchone()
+
+
+def test_record_session_schedules_hits_and_misses(db):
+    right, wrong = _questions(db, 2)
+    ReviewScheduler().record_session(1, [(right, True), (wrong, False)], now=NOW)
+
+    assert _state(db, right) == (1, str(NOW + timedelta(days=1)))
+    assert _state(db, wrong) == (0, str(NOW + RELEARN_DELAY))
+
+
+def test_record_session_doubles_interval_on_repeated_success(db):
+    question_id, = _questions(db, 1)
+    scheduler = ReviewScheduler()
+    for _ in range(3):
+        scheduler.record_session(1, [(question_id, True)], now=NOW)
+    assert _state(db, question_id)[0] == 4
+
+
+def test_record_session_keeps_running_success_rate(db):
+    question_id, = _questions(db, 1)
+    scheduler = ReviewScheduler()
+    for correct in (True, False, True, True):
+        scheduler.record_session(1, [(question_id, correct)], now=NOW)
+    attempts, success_rate = _progress(db, question_id)
+    assert attempts == 4
+    assert success_rate == 0.75
+
+
+def test_record_session_with_no_answers_is_a_no_op(db):
+    question_id, = _questions(db, 1)
+    ReviewScheduler().record_session(1, [], now=NOW)
+    assert _progress(db, question_id) is None
+
+
+def test_due_questions_follow_the_schedule(db):
+    right, wrong = _questions(db, 2)
+    scheduler = ReviewScheduler()
+    scheduler.record_session(1, [(right, True), (wrong, False)], now=NOW)
+
+    due = scheduler.due_questions(1, now=NOW + timedelta(hours=1))
+    assert [q['question_id'] for q in due] == [wrong]
+    assert scheduler.due_count(1, now=NOW + timedelta(days=2)) == 2
+    assert scheduler.due_count(2, now=NOW + timedelta(days=2)) == 0
@@ -0,0 +1,263 @@
+# File: utils/worker.py
+"""Standalone inference worker hosting QuestionGenerator.
+
+Run one or more of these next to the Streamlit servers, e.g.
+
+    EDUQUEST_WORKER_ADDRESS=127.0.0.1:6100 python -m utils.worker --cpus 0-3
+
+UI processes started with the same EDUQUEST_WORKER_ADDRESS talk to it through
+InferenceClient. Requests arriving close together are coalesced by question
+type into shared pipeline batches.
+"""
+import argparse
+import ipaddress
+import itertools
+import logging
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from multiprocessing.connection import Client, Listener
+from typing import Dict, List, Optional
+
+from utils.config import WORKER_ADDRESS, WORKER_AUTHKEY, DEFAULT_WORKER_AUTHKEY
+
+logger = logging.getLogger(__name__)
+
+
+def parse_address(address: str):
+    """'host:port' becomes a TCP address, anything else a unix socket path"""
+    host, sep, port = address.rpartition(':')
+    if sep and port.isdigit():
+        return (host or '127.0.0.1', int(port))
+    return address
+
+
+def is_local_address(address) -> bool:
+    """True for unix socket paths and loopback TCP hosts"""
+    if not isinstance(address, tuple):
+        return True
+    host = address[0]
+    if host == 'localhost':
+        return True
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return False  # Hostnames may resolve to anything
+
+
+def check_authkey(address, authkey: bytes):
+    """Refuse to expose the worker with the key that ships in the source"""
+    if authkey == DEFAULT_WORKER_AUTHKEY and not is_local_address(address):
+        raise ValueError(f"Set EDUQUEST_WORKER_AUTHKEY to listen on {address}; "
+                         "the default key is only allowed on loopback and unix socket addresses")
+
+
+def parse_cpus(spec: str) -> set:
+    """Parse a CPU list such as '0-3,6'"""
+    cpus = set()
+    for part in spec.split(','):
+        start, _, end = part.partition('-')
+        cpus.update(range(int(start), int(end or start) + 1))
+    return cpus
+
+
+class InferenceWorker:
+    def __init__(self, generator, max_wait: float = 0.05, max_requests: int = 32):
+        self.generator = generator
+        self.max_wait = max_wait  # Seconds to wait for more requests to join a batch
+        self.max_requests = max_requests
+        self._queue = queue.Queue()
+
+    def serve(self, address, authkey: bytes = WORKER_AUTHKEY):
+        check_authkey(address, authkey)
+        threading.Thread(target=self._batch_loop, daemon=True).start()
+        with Listener(address, authkey=authkey) as listener:
+            logger.info(f"Inference worker listening on {listener.address}")
+            while True:
+                try:
+                    conn = listener.accept()
+                except Exception as e:
+                    logger.warning(f"Rejected connection: {e}")
+                    continue
+                threading.Thread(target=self._read_loop, args=(conn,), daemon=True).start()
+
+    def _read_loop(self, conn):
+        """Queue every request sent over one client connection"""
+        send_lock = threading.Lock()
+        try:
+            while True:
+                request_id, payload = conn.recv()
+                self._queue.put((conn, send_lock, request_id, payload))
+        except (EOFError, OSError):
+            conn.close()
+
+    def _collect(self) -> List:
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_requests:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=timeout))
+            except queue.Empty:
+                break
+        return batch
+
+    def _batch_loop(self):
+        while True:
+            groups: Dict[str, List] = {}
+            for item in self._collect():
+                groups.setdefault(item[3]['q_type'], []).append(item)
+            for q_type, items in groups.items():
+                self._run_group(q_type, items)
+
+    @staticmethod
+    def _invalid(payload) -> Optional[str]:
+        """Why a request can't join a batch, or None if it can"""
+        context, count = payload.get('context'), payload.get('count')
+        if not isinstance(context, str) or not context.strip():
+            return "ValueError: Context cannot be empty"
+        if not isinstance(count, int) or count < 1:
+            return f"ValueError: Invalid question count: {count!r}"
+        return None
+
+    def _run_group(self, q_type: str, items: List):
+        # A bad request gets its own error instead of failing everyone batched with it
+        valid = []
+        for item in items:
+            error = self._invalid(item[3])
+            if error:
+                self._reply(item, ('error', error))
+            else:
+                valid.append(item)
+        if not valid:
+            return
+        
+        requests = [payload for _, _, _, payload in valid]
+        try:
+            results = self.generator.generate_many(requests, q_type)
+        except Exception as e:
+            results = [e] * len(valid)
+        for item, result in zip(valid, results):
+            if isinstance(result, Exception):
+                reply = ('error', f"{type(result).__name__}: {result}")
+            elif not result:
+                reply = ('error', f"Failed to generate valid {q_type} questions after {item[3]['count'] * 2} attempts")
+            else:
+                reply = ('ok', result)
+            self._reply(item, reply)
+
+    def _reply(self, item, reply):
+        conn, send_lock, request_id, _ = item
+        try:
+            with send_lock:
+                conn.send((request_id, reply))
+        except (EOFError, OSError):
+            logger.warning(f"Client went away before request {request_id} completed")
+
+
+class InferenceClient:
+    """Drop-in stand-in for QuestionGenerator that forwards to a worker"""
+
+    def __init__(self, address, authkey: bytes = WORKER_AUTHKEY, timeout: float = 600):
+        self.address = address
+        self.authkey = authkey
+        self.timeout = timeout
+        self._conn = None
+        self._pending: Dict[int, Future] = {}
+        self._ids = itertools.count()
+        self._lock = threading.Lock()
+
+    def _connection(self):
+        """Connect on first use and after the worker restarts (caller holds lock)"""
+        if self._conn is None:
+            self._conn = Client(self.address, authkey=self.authkey)
+            threading.Thread(target=self._read_loop, args=(self._conn,), daemon=True).start()
+        return self._conn
+
+    def _read_loop(self, conn):
+        try:
+            while True:
+                request_id, (status, value) = conn.recv()
+                future = self._pending.pop(request_id, None)
+                if future is None:
+                    continue
+                if status == 'ok':
+                    future.set_result(value)
+                else:
+                    future.set_exception(RuntimeError(value))
+        except (EOFError, OSError) as e:
+            with self._lock:
+                if self._conn is conn:
+                    self._conn = None
+                pending, self._pending = self._pending, {}
+            for future in pending.values():
+                future.set_exception(RuntimeError(f"Inference worker connection lost: {e}"))
+
+    def submit(self, context: str, q_type: str, count: int = 5,
+               pages: Optional[List[str]] = None, content_hash: Optional[str] = None) -> Future:
+        """Send a request and return a Future for its questions"""
+        future = Future()
+        with self._lock:
+            request_id = next(self._ids)
+            self._pending[request_id] = future
+            try:
+                self._connection().send((request_id, {'context': context, 'q_type': q_type,
+                                                     'count': count, 'pages': pages,
+                                                     'content_hash': content_hash}))
+            except Exception:
+                self._pending.pop(request_id, None)
+                self._conn = None
+                raise
+        return future
+
+    def generate_questions(self, context: str, q_type: str, count: int = 5,
+                           pages: Optional[List[str]] = None,
+                           content_hash: Optional[str] = None) -> List[Dict]:
+        return self.submit(context, q_type, count, pages, content_hash).result(timeout=self.timeout)
+
+    def generate_many(self, requests: List[Dict], q_type: str,
+                      on_question=None, cancel=None, round_size=None) -> List[List[Dict]]:
+        """Same contract as QuestionGenerator.generate_many; failed requests come back empty.
+
+        The worker returns each request whole, so on_question fires per request
+        rather than per question, and cancellation skips only unsent requests.
+        """
+        futures = [None if cancel and cancel.is_set() else
+                   self.submit(r['context'], q_type, r['count'], r.get('pages'), r.get('content_hash'))
+                   for r in requests]
+        results = []
+        for index, future in enumerate(futures):
+            try:
+                questions = future.result(timeout=self.timeout) if future else []
+            except Exception as e:
+                logger.warning(f"Worker request failed: {e}")
+                questions = []
+            for question in questions if on_question else []:
+                on_question(index, question)
+            results.append(questions)
+        return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="EduQuest inference worker")
+    parser.add_argument('--address', default=WORKER_ADDRESS or '127.0.0.1:6100')
+    parser.add_argument('--cpus', help="Pin the worker to these CPUs, e.g. 0-3")
+    parser.add_argument('--max-wait', type=float, default=0.05, help="Seconds to coalesce requests")
+    parser.add_argument('--max-requests', type=int, default=32, help="Requests per coalesced batch")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    if args.cpus:
+        os.sched_setaffinity(0, parse_cpus(args.cpus))
+
+    from utils.questions import QuestionGenerator
+    worker = InferenceWorker(QuestionGenerator(), max_wait=args.max_wait, max_requests=args.max_requests)
+    worker.serve(parse_address(args.address))
+
+
+if __name__ == "__main__":
+    main()